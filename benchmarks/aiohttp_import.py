@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+##########################################################################
+#
+# Import time and memory of vendored aiohttp
+#
+# Every scenario runs in fresh interpreter (several times, median is
+# reported):
+# - bare python (baseline)
+# - import aiohttp (lazy package init)
+# - what the gateway uses (ClientSession, CookieJar, WSMsgType)
+# - all public names (what "import aiohttp" cost with eager init)
+#
+# Usage: python benchmarks/aiohttp_import.py [-n RUNS]
+#
+##########################################################################
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ELAN2MQTT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'elan2mqtt')
+
+SCENARIOS = [
+    ('baseline', ''),
+    ('import aiohttp', 'import aiohttp'),
+    ('gateway usage', 'import aiohttp\n'
+                      'aiohttp.ClientSession, aiohttp.CookieJar, aiohttp.WSMsgType'),
+    ('all names (eager)', 'import aiohttp\n'
+                          'for name in aiohttp.__all__: getattr(aiohttp, name)'),
+]
+
+PROBE = '''
+import resource, sys, time
+sys.path.insert(0, %r)
+started = time.perf_counter()
+%s
+elapsed = time.perf_counter() - started
+modules = len([m for m in sys.modules if m.startswith('aiohttp')])
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, modules)
+'''
+
+
+def measure(code, runs):
+    times, rss = [], []
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, '-c', PROBE % (ELAN2MQTT, code)])
+        elapsed, maxrss, modules = output.decode('utf-8').split()
+        times.append(float(elapsed))
+        rss.append(int(maxrss))
+    return {'ms': statistics.median(times) * 1000, 'rss_kb': statistics.median(rss),
+            'modules': int(modules)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Import time and memory of vendored aiohttp')
+    parser.add_argument('-n', dest='runs', type=int, default=7, help='Runs per scenario')
+    parser.add_argument('-json', dest='json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    results = {name: measure(code, args.runs) for name, code in SCENARIOS}
+    if args.json:
+        print(json.dumps(results))
+    else:
+        baseline = results['baseline']['rss_kb']
+        print("%-20s%10s%14s%10s" % ('', 'time ms', 'RSS +kB', 'modules'))
+        for name, result in results.items():
+            print("%-20s%10.1f%14d%10d" % (name, result['ms'], result['rss_kb'] - baseline, result['modules']))
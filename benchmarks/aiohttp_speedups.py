@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+##########################################################################
+#
+# Benchmark of vendored aiohttp: pure python versus C extensions
+#
+# Local stand-in eLan (aiohttp.web) runs in its own process. The client
+# part runs twice - with AIOHTTP_NO_EXTENSIONS=1 and without it - and
+# measures:
+# - GET of device state (sequential and 8 concurrent, keep-alive)
+# - websocket frames received from eLan and sent to it (masked)
+#
+# Build extensions first (python3 elan2mqtt/build_aiohttp.py build_ext
+# --inplace), otherwise both runs are pure python.
+#
+# Usage: python benchmarks/aiohttp_speedups.py [-n NUMBER]
+#
+##########################################################################
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+ELAN2MQTT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'elan2mqtt')
+sys.path.insert(0, ELAN2MQTT)
+
+STATE = {"on": True, "brightness": 56, "delay": False, "automat": False, "locked": False,
+         "delayed off: set time": 0, "delayed on: set time": 0}
+
+
+def serve(port):
+    from aiohttp import web
+
+    async def state(request):
+        return web.json_response(STATE)
+
+    async def websocket(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        async for msg in ws:
+            if msg.data.startswith('burst '):
+                message = json.dumps({"device": "12345"})
+                for _ in range(int(msg.data[6:])):
+                    await ws.send_str(message)
+            elif msg.data == 'done':
+                await ws.send_str('done')
+        return ws
+
+    app = web.Application()
+    app.router.add_get('/api/devices/{id}/state', state)
+    app.router.add_get('/api/ws', websocket)
+    web.run_app(app, host='127.0.0.1', port=port, print=None)
+
+
+async def measure(url, number):
+    import aiohttp
+    results = {}
+    async with aiohttp.ClientSession() as session:
+        async def get():
+            async with session.get(url + '/api/devices/12345/state') as resp:
+                await resp.read()
+
+        started = time.perf_counter()
+        for _ in range(number):
+            await get()
+        results['GET sequential /s'] = number / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for _ in range(number // 8):
+            await asyncio.gather(*[get() for _ in range(8)])
+        results['GET 8 concurrent /s'] = (number // 8) * 8 / (time.perf_counter() - started)
+
+        async with session.ws_connect(url + '/api/ws') as ws:
+            frames = number * 10
+            started = time.perf_counter()
+            await ws.send_str('burst %d' % frames)
+            for _ in range(frames):
+                await ws.receive()
+            results['ws receive /s'] = frames / (time.perf_counter() - started)
+
+            payload = 'x' * 1024
+            started = time.perf_counter()
+            for _ in range(frames):
+                await ws.send_str(payload)
+            await ws.send_str('done')
+            while (await ws.receive()).data != 'done':
+                pass
+            results['ws send 1 kB /s'] = frames / (time.perf_counter() - started)
+    return results
+
+
+def client(url, number):
+    import speedups
+    results = asyncio.get_event_loop().run_until_complete(measure(url, number))
+    print(json.dumps({'speedups': speedups.describe(), 'results': results}))
+
+
+def run_client(url, number, pure):
+    env = dict(os.environ)
+    env.pop('AIOHTTP_NO_EXTENSIONS', None)
+    if pure:
+        env['AIOHTTP_NO_EXTENSIONS'] = '1'
+    output = subprocess.check_output(
+        [sys.executable, __file__, '-client', url, '-n', str(number)], env=env)
+    return json.loads(output.decode('utf-8').splitlines()[-1])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare pure python and C accelerated aiohttp')
+    parser.add_argument('-n', dest='number', type=int, default=2000, help='Requests per measurement')
+    parser.add_argument('-port', dest='port', type=int, default=8099, help='Port of stand-in eLan')
+    parser.add_argument('-serve', dest='serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('-client', dest='client', default='', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port)
+    elif args.client:
+        client(args.client, args.number)
+    else:
+        server = subprocess.Popen([sys.executable, __file__, '-serve', '-port', str(args.port)])
+        try:
+            time.sleep(2)
+            url = 'http://127.0.0.1:%d' % args.port
+            pure = run_client(url, args.number, pure=True)
+            accelerated = run_client(url, args.number, pure=False)
+        finally:
+            server.terminate()
+            server.wait()
+        print("pure python: " + pure['speedups'])
+        print("accelerated: " + accelerated['speedups'])
+        print("%-22s%14s%14s%10s" % ('', 'pure python', 'accelerated', 'speedup'))
+        for case, value in pure['results'].items():
+            fast = accelerated['results'][case]
+            print("%-22s%14.0f%14.0f%9.2fx" % (case, value, fast, fast / value))
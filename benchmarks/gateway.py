@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+
+##########################################################################
+#
+# End-to-end benchmark of the gateway (main_worker.py)
+#
+# The gateway runs as it does in production (its own process) against
+# local eLan simulator (elan_simulator.py) and MQTT broker stand-in
+# (mqtt_broker.py), both running in this process. Measured:
+# - startup time (start -> status of every device published) and RSS
+#   for 10, 100 and 500 devices
+# - sustained throughput of eLan websocket events -> published status
+# - latency of MQTT command -> published status (p50/p95/p99)
+# - CPU time and RSS growth of the gateway per 1000 events
+#
+# Results are printed and saved as JSON (-output). Compare mode flags
+# metrics which are worse than in baseline by more than tolerance:
+#
+#   python benchmarks/gateway.py -output baseline.json
+#   ... change ...
+#   python benchmarks/gateway.py -output new.json -compare baseline.json
+#   python benchmarks/gateway.py -results new.json -compare baseline.json
+#
+# Exit code is 1 when there is regression. CPU and RSS are read from
+# /proc (Linux only).
+#
+##########################################################################
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+ELAN2MQTT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'elan2mqtt')
+sys.path.insert(0, ELAN2MQTT)
+
+import json_codec  # noqa: E402
+import speedups  # noqa: E402
+from elan_simulator import ElanSimulator  # noqa: E402
+from mqtt_broker import MqttBroker  # noqa: E402
+
+# devices with "on" action and delay setting - targets of commands and state changes
+SWITCHES = ['RFSA-66M', 'RFUS-61']
+# state changes set unique value of this setting (every change is published)
+COUNTER = 'delayed off: set time'
+
+
+def process_stats(pid):
+    """Return (CPU time in s, RSS in MB) of process or (None, None)"""
+    try:
+        with open('/proc/%d/stat' % pid) as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/%d/status' % pid) as f:
+            rss = next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+    except (OSError, StopIteration):
+        return None, None
+    # utime and stime are fields 14 and 15 of stat (11 and 12 after the name)
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK'), rss / 1024
+
+
+class Bench:
+    """Simulator, broker and gateway process for one run"""
+
+    def __init__(self, simulator, gateway_args):
+        self.simulator = simulator
+        self.broker = MqttBroker(self._on_publish)
+        self._gateway_args = gateway_args
+        self.process = None
+        # status topic -> (time of last publish, payload)
+        self.statuses = {}
+        self.status_publishes = 0
+        # status topic (None = any) -> event set by its publish
+        self._published = {None: asyncio.Event()}
+        self.status_topics = {'eLan/%d/status' % info['device info']['address']: id
+                              for id, info in self.simulator.devices.items()}
+
+    def _on_publish(self, topic, payload):
+        if topic in self.status_topics:
+            self.statuses[topic] = (time.perf_counter(), payload)
+            self.status_publishes += 1
+            self._published[None].set()
+            if topic in self._published:
+                self._published[topic].set()
+
+    async def wait_for(self, condition, timeout, topic=None):
+        """Wait until condition() is true (checked after each status publish / publish to topic)"""
+        event = self._published.setdefault(topic, asyncio.Event())
+        deadline = time.perf_counter() + timeout
+        while not condition():
+            event.clear()
+            await asyncio.wait_for(event.wait(), deadline - time.perf_counter())
+
+    def published(self, topic, key):
+        """Value of key in the last published status"""
+        return json_codec.loads(self.statuses[topic][1]).get(key)
+
+    async def start(self):
+        await self.simulator.start()
+        port = await self.broker.start()
+        started = time.perf_counter()
+        self.process = subprocess.Popen(
+            [sys.executable, 'main_worker.py', self.simulator.url, 'mqtt://127.0.0.1:%d' % port,
+             '-elan-user', 'admin', '-elan-password', 'elan', '-websocket', 'true'] + self._gateway_args,
+            cwd=ELAN2MQTT, stdout=subprocess.DEVNULL)
+        await self.wait_for(lambda: len(self.statuses) == len(self.status_topics), 120)
+        return time.perf_counter() - started
+
+    async def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+        await self.broker.stop()
+        await self.simulator.stop()
+
+    def switches(self):
+        """Status topics and ids of devices which can be switched on/off"""
+        return [(topic, id) for topic, id in self.status_topics.items() if 'on' in self.simulator.states[id]]
+
+
+async def startup(devices, gateway_args):
+    bench = Bench(ElanSimulator(devices, seed=1), gateway_args)
+    try:
+        duration = await bench.start()
+        return duration, process_stats(bench.process.pid)[1]
+    finally:
+        await bench.stop()
+
+
+async def events_and_commands(devices, events, commands, gateway_args):
+    bench = Bench(ElanSimulator(devices, SWITCHES, seed=1), gateway_args)
+    results = {}
+    try:
+        await bench.start()
+        switches = bench.switches()
+        # let startup refreshes settle
+        await asyncio.sleep(1)
+
+        # websocket events: every device changes its state again as soon as
+        # the previous change is published (all devices at once)
+        async def change_device(topic, id, count):
+            for n in range(count):
+                value = bench.simulator.states[id][COUNTER] + 1
+                await bench.simulator.change(id, **{COUNTER: value})
+                await bench.wait_for(lambda: bench.published(topic, COUNTER) == value, 30, topic)
+
+        cpu, rss = process_stats(bench.process.pid)
+        publishes = bench.status_publishes
+        started = time.perf_counter()
+        await asyncio.gather(*[change_device(topic, id, events // len(switches)) for topic, id in switches])
+        events = events // len(switches) * len(switches)
+        results['event_throughput_per_s'] = events / (time.perf_counter() - started)
+        results['event_publishes'] = bench.status_publishes - publishes
+        cpu_after, rss_after = process_stats(bench.process.pid)
+        if cpu is not None:
+            results['cpu_s_per_1000_events'] = (cpu_after - cpu) * 1000 / events
+            results['rss_growth_mb_per_1000_events'] = (rss_after - rss) * 1000 / events
+            results['rss_mb'] = rss_after
+
+        # commands: one at a time, waiting for published status
+        latencies = []
+        for n in range(commands):
+            topic, id = switches[n % len(switches)]
+            on = not bench.simulator.states[id]['on']
+            started = time.perf_counter()
+            bench.broker.publish(topic[:-len('status')] + 'command', json_codec.dumps({'on': on}))
+            await bench.wait_for(lambda: bench.published(topic, 'on') == on, 10, topic)
+            latencies.append(bench.statuses[topic][0] - started)
+        latencies.sort()
+        for q in (50, 95, 99):
+            results['command_latency_p%d_s' % q] = latencies[min(len(latencies) - 1, len(latencies) * q // 100)]
+    finally:
+        await bench.stop()
+    return results
+
+
+async def run(options):
+    gateway_args = options.gateway_args.split()
+    results = {}
+    for devices in options.startup_devices:
+        duration, rss = await startup(devices, gateway_args)
+        results['startup_%d_devices_s' % devices] = duration
+        if rss is not None:
+            results['startup_%d_devices_rss_mb' % devices] = rss
+    results.update(await events_and_commands(options.devices, options.events, options.commands, gateway_args))
+    return results
+
+
+def environment():
+    try:
+        revision = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ELAN2MQTT,
+                                           stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = ''
+    return {'revision': revision, 'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'python': platform.python_version(),
+            'machine': platform.machine(), 'json codec': json_codec.NAME, 'aiohttp': speedups.describe()}
+
+
+def higher_is_better(metric):
+    return metric.endswith('_per_s')
+
+
+def compare(baseline, results, tolerance):
+    """Print comparison, return list of regressed metrics"""
+    regressions = []
+    print('%-36s %12s %12s %8s' % ('metric', 'baseline', 'current', 'change'))
+    for metric, value in results.items():
+        base = baseline.get(metric)
+        if base is None or metric.endswith('_publishes'):
+            print('%-36s %12s %12.4f' % (metric, '-', value))
+            continue
+        change = (value - base) / base if base else 0.0
+        worse = -change if higher_is_better(metric) else change
+        flag = ''
+        if worse > tolerance:
+            flag = '  REGRESSION'
+            regressions.append(metric)
+        print('%-36s %12.4f %12.4f %+7.1f%%%s' % (metric, base, value, change * 100, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end benchmark of the gateway')
+    parser.add_argument('-devices', type=int, default=100, help='devices for event and command runs')
+    parser.add_argument('-startup-devices', dest='startup_devices', type=lambda text: [int(n) for n in text.split(',')],
+                        default=[10, 100, 500], help='device counts of startup runs (comma separated)')
+    parser.add_argument('-events', type=int, default=5000, help='number of websocket events')
+    parser.add_argument('-commands', type=int, default=200, help='number of commands')
+    parser.add_argument('-gateway-args', dest='gateway_args', default='', help='extra arguments of main_worker.py')
+    parser.add_argument('-output', default='', help='save results to JSON file')
+    parser.add_argument('-results', default='', help='do not run, load results from JSON file (for -compare)')
+    parser.add_argument('-compare', default='', help='compare results with baseline JSON file')
+    parser.add_argument('-tolerance', type=float, default=0.1, help='allowed relative regression (0.1 = 10 %%)')
+    options = parser.parse_args()
+
+    if options.results:
+        with open(options.results) as f:
+            report = json.load(f)
+    else:
+        report = {'environment': environment(), 'results': asyncio.run(run(options))}
+        print(json.dumps(report, indent=2))
+        if options.output:
+            with open(options.output, 'w') as f:
+                json.dump(report, f, indent=2)
+
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+        print('\nbaseline %s (%s)' % (baseline['environment']['revision'], baseline['environment']['date']))
+        regressions = compare(baseline['results'], report['results'], options.tolerance)
+        if regressions:
+            print('\n%d metrics regressed by more than %d %%: %s'
+                  % (len(regressions), options.tolerance * 100, ', '.join(regressions)))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+##########################################################################
+#
+# Microbenchmark of JSON codecs on eLan payloads
+#
+# Compares codecs installed here (json_codec.available()) on:
+# - device states as returned by eLan (decode + encode, status publish)
+# - HA discovery messages (encode)
+# - device info (decode, startup)
+#
+# Usage: python benchmarks/json_codecs.py [-n NUMBER]
+#
+##########################################################################
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'elan2mqtt'))
+
+import json_codec  # noqa: E402
+from discovery import DiscoveryRegistry  # noqa: E402
+
+STATES = [
+    b'{"on": true, "delay": false, "automat": false, "locked": false, "delayed off: set time": 0, "delayed on: set time": 0}',
+    b'{"brightness": 56, "on": true, "delay": false, "automat": false, "locked": false, "delayed off: set time": 0}',
+    b'{"temperature IN": 21.5, "temperature OUT": 19.8, "open window": false, "battery": true, "on": true, "locked": false}',
+    b'{"alarm": true, "detect": false, "tamper": "closed", "automat": false, "battery": true, "disarm": false}',
+]
+
+def device_infos():
+    return [
+        {"device info": {"type": "dimmed light", "product type": "RFDA-11B", "address": 100001, "label": "Living room"},
+         "actions info": {"brightness": {"type": "int", "min": 0, "max": 100, "step": 10}, "on": {"type": "bool"}},
+         "primary actions": ["brightness"], "secondary actions": [], "settings": {}, "id": "1"},
+        {"device info": {"type": "heating", "product type": "RFSTI-11G", "address": 100002, "label": "Bedroom"},
+         "actions info": {"safe on": {"type": "bool"}, "correction": {"type": "number", "min": -5, "max": 5}},
+         "primary actions": [], "secondary actions": [], "settings": {}, "id": "2"},
+        {"device info": {"type": "window detector", "product type": "RFWD-100", "address": 100003, "label": "Front door"},
+         "actions info": {"automat": {"type": "bool"}, "disarm": {"type": "bool"}},
+         "primary actions": ["detect"], "secondary actions": [], "settings": {}, "id": "3"},
+    ]
+
+
+def discovery_messages():
+    registry = DiscoveryRegistry()
+    messages = []
+    for info in device_infos():
+        mac = str(info['device info']['address'])
+        device = {'info': info, 'status_topic': 'eLan/' + mac + '/status',
+                  'control_topic': 'eLan/' + mac + '/command'}
+        messages.extend(json.loads(payload) for topic, payload in registry.payloads(mac, device))
+    return messages
+
+
+def bench(function, number):
+    """Return time of one call in us (best of 5)"""
+    return min(timeit.repeat(function, number=number, repeat=5)) / number * 1e6
+
+
+def run(number):
+    states = [json.loads(state) for state in STATES]
+    infos = [json.dumps(info).encode('utf-8') for info in device_infos()]
+    messages = discovery_messages()
+    results = {}
+    for codec in json_codec.available():
+        results[codec.name] = {
+            'state decode+encode': bench(lambda: [codec.dumpb(codec.loads(s)) for s in STATES], number) / len(STATES),
+            'state canonical': bench(lambda: [codec.canonical(s) for s in states], number) / len(states),
+            'discovery encode': bench(lambda: [codec.dumpb(m) for m in messages], number) / len(messages),
+            'device info decode': bench(lambda: [codec.loads(i) for i in infos], number) / len(infos),
+        }
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare JSON codecs on eLan payloads')
+    parser.add_argument('-n', dest='number', type=int, default=10000, help='Calls per measurement')
+    args = parser.parse_args()
+
+    results = run(args.number)
+    print("Active codec: " + json_codec.NAME)
+    names = list(results)
+    print("%-22s" % "us per payload" + "".join("%12s" % name for name in names))
+    for case in results[names[0]]:
+        print("%-22s" % case + "".join("%12.2f" % results[name][case] for name in names))
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+
+##########################################################################
+#
+# Replay of recorded gateway traffic (main_worker.py -record-file)
+#
+# Devices, their info and states are taken from the recording and served
+# by eLan simulator, the gateway runs against it and in-process MQTT
+# broker stand-in (as in benchmarks/gateway.py). Recorded websocket
+# frames are sent to the gateway and recorded MQTT messages published
+# to it in the recorded order - at recorded pace (-speed 1), faster
+# (-speed 10) or as fast as possible (-speed 0). Before each frame the
+# simulator switches the device to the state the gateway read after the
+# frame in the recording.
+#
+# Measured: replay duration (until the last status published by the
+# gateway), events per s, how much the replay fell behind the schedule,
+# published statuses, gateway CPU time and RSS.
+#
+#   python benchmarks/replay.py evening.rec -speed 10 -output result.json
+#   python benchmarks/replay.py evening.rec -speed 10 -compare result.json
+#
+##########################################################################
+
+import argparse
+import asyncio
+import bisect
+import json
+import os
+import sys
+import time
+
+from gateway import ELAN2MQTT, Bench, compare, environment, process_stats
+
+sys.path.insert(0, ELAN2MQTT)
+
+import json_codec  # noqa: E402
+from elan_simulator import ElanSimulator  # noqa: E402
+from traffic_recorder import read_records  # noqa: E402
+
+
+class Recording:
+    """Devices, device states and timeline of events from recording"""
+
+    def __init__(self, path):
+        self.infos = {}
+        # device id -> sorted times of recorded states, states
+        self.state_times = {}
+        self.states = {}
+        # (time, 'ws', frame) and (time, 'mqtt', topic, payload)
+        self.timeline = []
+        requests = {}
+        offset = last = 0.0
+        for record in read_records(path):
+            kind = record[0]
+            if kind == 'start':
+                # recording appended by restarted gateway continues after the previous one
+                offset = last
+                requests = {}
+                continue
+            last = record[1] + offset
+            if kind == 'ws':
+                self.timeline.append((last, 'ws', record[2]))
+            elif kind == 'mqtt':
+                self.timeline.append((last, 'mqtt', record[2], record[3]))
+            elif kind == 'http':
+                requests[record[2]] = record
+            elif kind == 'body':
+                request = requests.pop(record[2], None)
+                if request is not None and request[3] == 'GET' and request[5] == 200:
+                    self._response(request[4], record[3], last)
+
+    def _response(self, url, body, timestamp):
+        path = url.split('/api/devices/', 1)
+        if len(path) < 2:
+            return
+        try:
+            data = json_codec.loads(body)
+        except ValueError:
+            return
+        id, _, rest = path[1].partition('/')
+        if not rest and isinstance(data, dict) and 'device info' in data:
+            self.infos[id] = data
+        elif rest == 'state':
+            self.state_times.setdefault(id, []).append(timestamp)
+            self.states.setdefault(id, []).append(data)
+
+    def state_after(self, id, timestamp):
+        """State of device read first after timestamp (None when there is none)"""
+        times = self.state_times.get(id)
+        if not times:
+            return None
+        i = bisect.bisect_left(times, timestamp)
+        return self.states[id][i] if i < len(times) else None
+
+    def simulator(self):
+        simulator = ElanSimulator(devices=0)
+        for id, info in self.infos.items():
+            simulator.add_device_info(info, dict(self.states[id][0]) if id in self.states else {})
+        return simulator
+
+
+async def replay(recording, speed, gateway_args):
+    bench = Bench(recording.simulator(), gateway_args)
+    results = {}
+    try:
+        await bench.start()
+        await asyncio.sleep(1)
+        cpu, rss = process_stats(bench.process.pid)
+        publishes = bench.status_publishes
+        frames = messages = 0
+        behind = 0.0
+        begin = recording.timeline[0][0] if recording.timeline else 0.0
+        started = time.perf_counter()
+        for event in recording.timeline:
+            if speed > 0:
+                delay = (event[0] - begin) / speed - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    behind = max(behind, -delay)
+            if event[1] == 'ws':
+                try:
+                    id = str(json_codec.loads(event[2])['device'])
+                except (ValueError, KeyError, TypeError):
+                    id = None
+                state = recording.state_after(id, event[0])
+                if state is not None:
+                    bench.simulator.states[id] = dict(state)
+                await bench.simulator.announce(id, event[2])
+                frames += 1
+            else:
+                bench.broker.publish(event[2], event[3])
+                messages += 1
+                # let gateway commands reach the simulator in order
+                await asyncio.sleep(0)
+        replayed = time.perf_counter() - started
+
+        # wait until the gateway is done (no status published for 1 s)
+        count = -1
+        while count != bench.status_publishes and time.perf_counter() - started < replayed + 30:
+            count = bench.status_publishes
+            await asyncio.sleep(1)
+        cpu_after, rss_after = process_stats(bench.process.pid)
+        # replay ends when the gateway published the last status
+        if bench.status_publishes > publishes:
+            replayed = max(replayed, max(timestamp for timestamp, payload in bench.statuses.values()) - started)
+
+        results['recording_s'] = recording.timeline[-1][0] - begin if recording.timeline else 0.0
+        results['replay_s'] = replayed
+        results['replay_events_per_s'] = (frames + messages) / replayed if replayed else 0.0
+        results['replay_behind_max_s'] = behind
+        results['websocket_frames'] = frames
+        results['mqtt_messages'] = messages
+        results['status_publishes'] = bench.status_publishes - publishes
+        if cpu is not None:
+            results['cpu_s'] = cpu_after - cpu
+            results['rss_mb'] = rss_after
+    finally:
+        await bench.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay recorded traffic against the gateway')
+    parser.add_argument('recording', help='file recorded by main_worker.py -record-file')
+    parser.add_argument('-speed', type=float, default=1, help='replay speed (1 = as recorded, 0 = max)')
+    parser.add_argument('-gateway-args', dest='gateway_args', default='', help='extra arguments of main_worker.py')
+    parser.add_argument('-output', default='', help='save results to JSON file')
+    parser.add_argument('-compare', default='', help='compare results with baseline JSON file')
+    parser.add_argument('-tolerance', type=float, default=0.1, help='allowed relative regression (0.1 = 10 %%)')
+    options = parser.parse_args()
+
+    recording = Recording(options.recording)
+    print('%s: %d devices, %d events' % (os.path.basename(options.recording), len(recording.infos),
+                                          len(recording.timeline)))
+    if not recording.infos:
+        sys.exit('No device info in recording (record from the start of the gateway)')
+    report = {'environment': environment(), 'recording': options.recording, 'speed': options.speed,
+              'results': asyncio.run(replay(recording, options.speed, options.gateway_args.split()))}
+    print(json.dumps(report, indent=2))
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+        if compare(baseline['results'], report['results'], options.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
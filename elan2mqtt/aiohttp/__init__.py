@@ -1,108 +1,231 @@
 __version__ = "3.8.1"
 
-from typing import Tuple
+# Submodules are imported lazily - on first access of a name exported from
+# them (PEP 562). "import aiohttp" is cheap then and applications using only
+# the client do not pay for multipart, tracing, worker and other machinery.
 
-from . import hdrs as hdrs
-from .client import (
-    BaseConnector as BaseConnector,
-    ClientConnectionError as ClientConnectionError,
-    ClientConnectorCertificateError as ClientConnectorCertificateError,
-    ClientConnectorError as ClientConnectorError,
-    ClientConnectorSSLError as ClientConnectorSSLError,
-    ClientError as ClientError,
-    ClientHttpProxyError as ClientHttpProxyError,
-    ClientOSError as ClientOSError,
-    ClientPayloadError as ClientPayloadError,
-    ClientProxyConnectionError as ClientProxyConnectionError,
-    ClientRequest as ClientRequest,
-    ClientResponse as ClientResponse,
-    ClientResponseError as ClientResponseError,
-    ClientSession as ClientSession,
-    ClientSSLError as ClientSSLError,
-    ClientTimeout as ClientTimeout,
-    ClientWebSocketResponse as ClientWebSocketResponse,
-    ContentTypeError as ContentTypeError,
-    Fingerprint as Fingerprint,
-    InvalidURL as InvalidURL,
-    NamedPipeConnector as NamedPipeConnector,
-    RequestInfo as RequestInfo,
-    ServerConnectionError as ServerConnectionError,
-    ServerDisconnectedError as ServerDisconnectedError,
-    ServerFingerprintMismatch as ServerFingerprintMismatch,
-    ServerTimeoutError as ServerTimeoutError,
-    TCPConnector as TCPConnector,
-    TooManyRedirects as TooManyRedirects,
-    UnixConnector as UnixConnector,
-    WSServerHandshakeError as WSServerHandshakeError,
-    request as request,
-)
-from .cookiejar import CookieJar as CookieJar, DummyCookieJar as DummyCookieJar
-from .formdata import FormData as FormData
-from .helpers import BasicAuth, ChainMapProxy, ETag
-from .http import (
-    HttpVersion as HttpVersion,
-    HttpVersion10 as HttpVersion10,
-    HttpVersion11 as HttpVersion11,
-    WebSocketError as WebSocketError,
-    WSCloseCode as WSCloseCode,
-    WSMessage as WSMessage,
-    WSMsgType as WSMsgType,
-)
-from .multipart import (
-    BadContentDispositionHeader as BadContentDispositionHeader,
-    BadContentDispositionParam as BadContentDispositionParam,
-    BodyPartReader as BodyPartReader,
-    MultipartReader as MultipartReader,
-    MultipartWriter as MultipartWriter,
-    content_disposition_filename as content_disposition_filename,
-    parse_content_disposition as parse_content_disposition,
-)
-from .payload import (
-    PAYLOAD_REGISTRY as PAYLOAD_REGISTRY,
-    AsyncIterablePayload as AsyncIterablePayload,
-    BufferedReaderPayload as BufferedReaderPayload,
-    BytesIOPayload as BytesIOPayload,
-    BytesPayload as BytesPayload,
-    IOBasePayload as IOBasePayload,
-    JsonPayload as JsonPayload,
-    Payload as Payload,
-    StringIOPayload as StringIOPayload,
-    StringPayload as StringPayload,
-    TextIOPayload as TextIOPayload,
-    get_payload as get_payload,
-    payload_type as payload_type,
-)
-from .payload_streamer import streamer as streamer
-from .resolver import (
-    AsyncResolver as AsyncResolver,
-    DefaultResolver as DefaultResolver,
-    ThreadedResolver as ThreadedResolver,
-)
-from .streams import (
-    EMPTY_PAYLOAD as EMPTY_PAYLOAD,
-    DataQueue as DataQueue,
-    EofStream as EofStream,
-    FlowControlDataQueue as FlowControlDataQueue,
-    StreamReader as StreamReader,
-)
-from .tracing import (
-    TraceConfig as TraceConfig,
-    TraceConnectionCreateEndParams as TraceConnectionCreateEndParams,
-    TraceConnectionCreateStartParams as TraceConnectionCreateStartParams,
-    TraceConnectionQueuedEndParams as TraceConnectionQueuedEndParams,
-    TraceConnectionQueuedStartParams as TraceConnectionQueuedStartParams,
-    TraceConnectionReuseconnParams as TraceConnectionReuseconnParams,
-    TraceDnsCacheHitParams as TraceDnsCacheHitParams,
-    TraceDnsCacheMissParams as TraceDnsCacheMissParams,
-    TraceDnsResolveHostEndParams as TraceDnsResolveHostEndParams,
-    TraceDnsResolveHostStartParams as TraceDnsResolveHostStartParams,
-    TraceRequestChunkSentParams as TraceRequestChunkSentParams,
-    TraceRequestEndParams as TraceRequestEndParams,
-    TraceRequestExceptionParams as TraceRequestExceptionParams,
-    TraceRequestRedirectParams as TraceRequestRedirectParams,
-    TraceRequestStartParams as TraceRequestStartParams,
-    TraceResponseChunkReceivedParams as TraceResponseChunkReceivedParams,
-)
+import importlib
+import importlib.util
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+
+if TYPE_CHECKING:  # pragma: no cover
+    from . import hdrs as hdrs
+    from .client import (
+        BaseConnector as BaseConnector,
+        ClientConnectionError as ClientConnectionError,
+        ClientConnectorCertificateError as ClientConnectorCertificateError,
+        ClientConnectorError as ClientConnectorError,
+        ClientConnectorSSLError as ClientConnectorSSLError,
+        ClientError as ClientError,
+        ClientHttpProxyError as ClientHttpProxyError,
+        ClientOSError as ClientOSError,
+        ClientPayloadError as ClientPayloadError,
+        ClientProxyConnectionError as ClientProxyConnectionError,
+        ClientRequest as ClientRequest,
+        ClientResponse as ClientResponse,
+        ClientResponseError as ClientResponseError,
+        ClientSession as ClientSession,
+        ClientSSLError as ClientSSLError,
+        ClientTimeout as ClientTimeout,
+        ClientWebSocketResponse as ClientWebSocketResponse,
+        ContentTypeError as ContentTypeError,
+        Fingerprint as Fingerprint,
+        InvalidURL as InvalidURL,
+        NamedPipeConnector as NamedPipeConnector,
+        RequestInfo as RequestInfo,
+        ServerConnectionError as ServerConnectionError,
+        ServerDisconnectedError as ServerDisconnectedError,
+        ServerFingerprintMismatch as ServerFingerprintMismatch,
+        ServerTimeoutError as ServerTimeoutError,
+        TCPConnector as TCPConnector,
+        TooManyRedirects as TooManyRedirects,
+        UnixConnector as UnixConnector,
+        WSServerHandshakeError as WSServerHandshakeError,
+        request as request,
+    )
+    from .cookiejar import CookieJar as CookieJar, DummyCookieJar as DummyCookieJar
+    from .formdata import FormData as FormData
+    from .helpers import BasicAuth, ChainMapProxy, ETag
+    from .http import (
+        HttpVersion as HttpVersion,
+        HttpVersion10 as HttpVersion10,
+        HttpVersion11 as HttpVersion11,
+        WebSocketError as WebSocketError,
+        WSCloseCode as WSCloseCode,
+        WSMessage as WSMessage,
+        WSMsgType as WSMsgType,
+    )
+    from .multipart import (
+        BadContentDispositionHeader as BadContentDispositionHeader,
+        BadContentDispositionParam as BadContentDispositionParam,
+        BodyPartReader as BodyPartReader,
+        MultipartReader as MultipartReader,
+        MultipartWriter as MultipartWriter,
+        content_disposition_filename as content_disposition_filename,
+        parse_content_disposition as parse_content_disposition,
+    )
+    from .payload import (
+        PAYLOAD_REGISTRY as PAYLOAD_REGISTRY,
+        AsyncIterablePayload as AsyncIterablePayload,
+        BufferedReaderPayload as BufferedReaderPayload,
+        BytesIOPayload as BytesIOPayload,
+        BytesPayload as BytesPayload,
+        IOBasePayload as IOBasePayload,
+        JsonPayload as JsonPayload,
+        Payload as Payload,
+        StringIOPayload as StringIOPayload,
+        StringPayload as StringPayload,
+        TextIOPayload as TextIOPayload,
+        get_payload as get_payload,
+        payload_type as payload_type,
+    )
+    from .payload_streamer import streamer as streamer
+    from .resolver import (
+        AsyncResolver as AsyncResolver,
+        DefaultResolver as DefaultResolver,
+        ThreadedResolver as ThreadedResolver,
+    )
+    from .streams import (
+        EMPTY_PAYLOAD as EMPTY_PAYLOAD,
+        DataQueue as DataQueue,
+        EofStream as EofStream,
+        FlowControlDataQueue as FlowControlDataQueue,
+        StreamReader as StreamReader,
+    )
+    from .tracing import (
+        TraceConfig as TraceConfig,
+        TraceConnectionCreateEndParams as TraceConnectionCreateEndParams,
+        TraceConnectionCreateStartParams as TraceConnectionCreateStartParams,
+        TraceConnectionQueuedEndParams as TraceConnectionQueuedEndParams,
+        TraceConnectionQueuedStartParams as TraceConnectionQueuedStartParams,
+        TraceConnectionReuseconnParams as TraceConnectionReuseconnParams,
+        TraceDnsCacheHitParams as TraceDnsCacheHitParams,
+        TraceDnsCacheMissParams as TraceDnsCacheMissParams,
+        TraceDnsResolveHostEndParams as TraceDnsResolveHostEndParams,
+        TraceDnsResolveHostStartParams as TraceDnsResolveHostStartParams,
+        TraceRequestChunkSentParams as TraceRequestChunkSentParams,
+        TraceRequestEndParams as TraceRequestEndParams,
+        TraceRequestExceptionParams as TraceRequestExceptionParams,
+        TraceRequestRedirectParams as TraceRequestRedirectParams,
+        TraceRequestStartParams as TraceRequestStartParams,
+        TraceResponseChunkReceivedParams as TraceResponseChunkReceivedParams,
+    )
+    from .worker import GunicornUVLoopWebWorker, GunicornWebWorker
+
+_LAZY_IMPORTS: Dict[str, Tuple[str, ...]] = {
+    "client": (
+        "BaseConnector",
+        "ClientConnectionError",
+        "ClientConnectorCertificateError",
+        "ClientConnectorError",
+        "ClientConnectorSSLError",
+        "ClientError",
+        "ClientHttpProxyError",
+        "ClientOSError",
+        "ClientPayloadError",
+        "ClientProxyConnectionError",
+        "ClientRequest",
+        "ClientResponse",
+        "ClientResponseError",
+        "ClientSession",
+        "ClientSSLError",
+        "ClientTimeout",
+        "ClientWebSocketResponse",
+        "ContentTypeError",
+        "Fingerprint",
+        "InvalidURL",
+        "NamedPipeConnector",
+        "RequestInfo",
+        "ServerConnectionError",
+        "ServerDisconnectedError",
+        "ServerFingerprintMismatch",
+        "ServerTimeoutError",
+        "TCPConnector",
+        "TooManyRedirects",
+        "UnixConnector",
+        "WSServerHandshakeError",
+        "request",
+    ),
+    "cookiejar": (
+        "CookieJar",
+        "DummyCookieJar",
+    ),
+    "formdata": (
+        "FormData",
+    ),
+    "helpers": (
+        "BasicAuth",
+        "ChainMapProxy",
+        "ETag",
+    ),
+    "http": (
+        "HttpVersion",
+        "HttpVersion10",
+        "HttpVersion11",
+        "WebSocketError",
+        "WSCloseCode",
+        "WSMessage",
+        "WSMsgType",
+    ),
+    "multipart": (
+        "BadContentDispositionHeader",
+        "BadContentDispositionParam",
+        "BodyPartReader",
+        "MultipartReader",
+        "MultipartWriter",
+        "content_disposition_filename",
+        "parse_content_disposition",
+    ),
+    "payload": (
+        "PAYLOAD_REGISTRY",
+        "AsyncIterablePayload",
+        "BufferedReaderPayload",
+        "BytesIOPayload",
+        "BytesPayload",
+        "IOBasePayload",
+        "JsonPayload",
+        "Payload",
+        "StringIOPayload",
+        "StringPayload",
+        "TextIOPayload",
+        "get_payload",
+        "payload_type",
+    ),
+    "payload_streamer": (
+        "streamer",
+    ),
+    "resolver": (
+        "AsyncResolver",
+        "DefaultResolver",
+        "ThreadedResolver",
+    ),
+    "streams": (
+        "EMPTY_PAYLOAD",
+        "DataQueue",
+        "EofStream",
+        "FlowControlDataQueue",
+        "StreamReader",
+    ),
+    "tracing": (
+        "TraceConfig",
+        "TraceConnectionCreateEndParams",
+        "TraceConnectionCreateStartParams",
+        "TraceConnectionQueuedEndParams",
+        "TraceConnectionQueuedStartParams",
+        "TraceConnectionReuseconnParams",
+        "TraceDnsCacheHitParams",
+        "TraceDnsCacheMissParams",
+        "TraceDnsResolveHostEndParams",
+        "TraceDnsResolveHostStartParams",
+        "TraceRequestChunkSentParams",
+        "TraceRequestEndParams",
+        "TraceRequestExceptionParams",
+        "TraceRequestRedirectParams",
+        "TraceRequestStartParams",
+        "TraceResponseChunkReceivedParams",
+    ),
+    "worker": ("GunicornWebWorker", "GunicornUVLoopWebWorker"),
+}
 
 __all__: Tuple[str, ...] = (
     "hdrs",
@@ -208,9 +331,31 @@ __all__: Tuple[str, ...] = (
     "TraceResponseChunkReceivedParams",
 )
 
-try:
-    from .worker import GunicornUVLoopWebWorker, GunicornWebWorker
-
+if importlib.util.find_spec("gunicorn") is not None:  # pragma: no cover
     __all__ += ("GunicornWebWorker", "GunicornUVLoopWebWorker")
-except ImportError:  # pragma: no cover
-    pass
+
+_NAME_TO_MODULE = {
+    name: module for module, names in _LAZY_IMPORTS.items() for name in names
+}
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _NAME_TO_MODULE.get(name)
+    if module_name is None:
+        # submodules (aiohttp.hdrs, aiohttp.helpers, ...) used to be
+        # available as attributes because they were imported eagerly
+        if name.startswith("__"):
+            raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+        try:
+            return importlib.import_module("." + name, __name__)
+        except ModuleNotFoundError:
+            raise AttributeError(
+                f"module {__name__!r} has no attribute {name!r}"
+            ) from None
+    value = getattr(importlib.import_module("." + module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_NAME_TO_MODULE))
@@ -66,10 +66,15 @@ except ImportError:  # pragma: no cover
     ssl = None  # type: ignore[assignment]
     SSLContext = object  # type: ignore[misc,assignment]
 
-try:
-    import cchardet as chardet
-except ImportError:  # pragma: no cover
-    import charset_normalizer as chardet  # type: ignore[no-redef]
+
+def _detect_encoding(body: bytes) -> Optional[str]:
+    # charset detection is imported on first use - it is needed only for
+    # responses without charset which are not JSON, and it is heavy to import
+    try:
+        import cchardet as chardet
+    except ImportError:  # pragma: no cover
+        import charset_normalizer as chardet  # type: ignore[no-redef]
+    return chardet.detect(body)["encoding"]  # type: ignore[no-any-return]
 
 
 __all__ = ("ClientRequest", "ClientResponse", "RequestInfo", "Fingerprint")
@@ -1068,7 +1073,7 @@ class ClientResponse(HeadersMixin):
                     "Cannot guess the encoding of " "a not yet read body"
                 )
             else:
-                encoding = chardet.detect(self._body)["encoding"]
+                encoding = _detect_encoding(self._body)
         if not encoding:
             encoding = "utf-8"
 
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+##########################################################################
+#
+# Build C extensions of vendored aiohttp (in place)
+#
+#   python3 build_aiohttp.py build_ext --inplace
+#
+# HTTP parser needs llhttp sources in vendor/llhttp (they are part of
+# aiohttp 3.8.1 sdist, see Dockerfile). Without them only the other
+# extensions are built. When Cython is installed C files are generated
+# again from .pyx, so they compile against current Python.
+#
+# Missing extension is not an error - aiohttp falls back to pure python
+# (see speedups.py for what is used at runtime).
+#
+##########################################################################
+
+import os
+
+from setuptools import Extension, setup
+
+try:
+    from Cython.Build import cythonize
+except ImportError:
+    cythonize = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+os.chdir(HERE)
+
+source = 'pyx' if cythonize is not None else 'c'
+
+extensions = [
+    Extension('aiohttp._websocket', ['aiohttp/_websocket.' + source]),
+    Extension('aiohttp._helpers', ['aiohttp/_helpers.' + source]),
+    Extension('aiohttp._http_writer', ['aiohttp/_http_writer.' + source]),
+]
+
+if os.path.exists('vendor/llhttp/build/llhttp.h'):
+    extensions.append(Extension(
+        'aiohttp._http_parser',
+        [
+            'aiohttp/_http_parser.' + source,
+            'aiohttp/_find_header.c',
+            'vendor/llhttp/build/c/llhttp.c',
+            'vendor/llhttp/src/native/api.c',
+            'vendor/llhttp/src/native/http.c',
+        ],
+        define_macros=[('LLHTTP_STRICT_MODE', 0)],
+        include_dirs=['vendor/llhttp/build'],
+    ))
+else:
+    print('vendor/llhttp not found, HTTP parser extension is not built')
+
+if cythonize is not None:
+    extensions = cythonize(extensions, include_path=['aiohttp'],
+                           compiler_directives={'language_level': 3})
+
+setup(name='elan2mqtt-aiohttp-speedups', ext_modules=extensions)
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+##########################################################################
+#
+# Per-device command dispatcher
+#
+# Every device (MAC) gets its own queue and worker task:
+# - commands for the same device are processed in order of arrival
+# - commands for different devices are processed in parallel
+# - number of commands processed at once is limited by global cap
+#
+# Commands waiting for the same device are coalesced into single command:
+# - newer value of the same key supersedes the older one
+#   (e.g. brightness slider flooding {"brightness": N})
+# - different keys are merged into one PUT
+# - trigger actions (eLan "type": null, e.g. dimmer "increase", relay
+#   "delayed off") are not values - repeated trigger is never merged,
+#   every one of them is sent
+# Command for idle device is sent at once, only commands arriving while
+# the previous one is sent (or waiting for the global cap) are merged,
+# unless coalesce window is set.
+# Commands are JSON objects (dicts), anything else is passed as it is.
+# Raw commands (bytes, passthrough mode) are parsed only when there is
+# another command to merge them with.
+#
+##########################################################################
+
+import asyncio
+import collections
+import logging
+
+import json_codec
+
+logger = logging.getLogger(__name__)
+
+
+class CommandDispatcher:
+    """Route commands to per-device worker tasks.
+
+    handler is coroutine function handler(mac, data) which performs the command.
+    coalesce_window is time in s the worker waits for more commands
+    before it merges them and calls handler (0 merges only commands already waiting).
+    """
+
+    def __init__(self, handler, max_concurrency=4, coalesce_window=0.0):
+        self._handler = handler
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._coalesce_window = coalesce_window
+        self._queues = {}
+        self._wakeups = {}
+        self._workers = {}
+        self._triggers = {}
+        self.commands_received = 0
+        self.commands_sent = 0
+
+    def add_device(self, mac, triggers=()):
+        """Create queue and worker task for device (if not created yet)
+
+        triggers are names of trigger actions of the device (not merged when repeated).
+        """
+        self._triggers[mac] = frozenset(triggers)
+        if mac not in self._queues:
+            self._queues[mac] = collections.deque()
+            self._wakeups[mac] = asyncio.Event()
+            self._workers[mac] = asyncio.ensure_future(self._worker(mac))
+
+    async def remove_device(self, mac):
+        """Stop worker of device (e.g. removed from eLan). Its queued commands are dropped."""
+        worker = self._workers.pop(mac, None)
+        self._queues.pop(mac, None)
+        self._wakeups.pop(mac, None)
+        self._triggers.pop(mac, None)
+        if worker is not None:
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+
+    def dispatch(self, mac, data):
+        """Queue command for device. Returns False for unknown device."""
+        queue = self._queues.get(mac)
+        if queue is None:
+            return False
+        queue.append(data)
+        self.commands_received += 1
+        self._wakeups[mac].set()
+        logger.debug("Command queued for " + mac + " queue depth " + str(len(queue)))
+        return True
+
+    def queue_depth(self):
+        """Number of commands waiting per device"""
+        return {mac: len(queue) for mac, queue in self._queues.items()}
+
+    @staticmethod
+    def _as_dict(data):
+        """Return command as dict or None when it can not be merged"""
+        if isinstance(data, (bytes, bytearray)):
+            try:
+                data = json_codec.loads(data)
+            except ValueError:
+                return None
+        return data if isinstance(data, dict) else None
+
+    @classmethod
+    def _coalesce(cls, queue, triggers=frozenset()):
+        """Take first command from queue and merge following commands into it"""
+        data = queue.popleft()
+        merged = 1
+        if not queue:
+            # nothing to merge with - raw command stays unparsed
+            return data, merged
+        first = cls._as_dict(data)
+        if first is not None:
+            data = first
+            while queue:
+                following = cls._as_dict(queue[0])
+                if following is None or any(key in data for key in triggers.intersection(following)):
+                    # repeated trigger is sent in the next PUT
+                    break
+                queue.popleft()
+                data = {**data, **following}
+                merged += 1
+        return data, merged
+
+    async def _worker(self, mac):
+        queue = self._queues[mac]
+        wakeup = self._wakeups[mac]
+        while True:
+            if not queue:
+                wakeup.clear()
+                await wakeup.wait()
+                if self._coalesce_window > 0:
+                    # give burst of commands (slider, rapid toggles) chance to arrive
+                    await asyncio.sleep(self._coalesce_window)
+            try:
+                async with self._semaphore:
+                    # coalesce as late as possible - commands arriving while
+                    # waiting for semaphore are merged too
+                    data, merged = self._coalesce(queue, self._triggers[mac])
+                    if merged > 1:
+                        logger.debug(str(merged) + " commands for " + mac + " merged into " + str(data))
+                    self.commands_sent += 1
+                    await self._handler(mac, data)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Command for " + mac + " failed")
+
+    async def close(self):
+        """Stop all worker tasks. Commands still in queues are dropped."""
+        for worker in self._workers.values():
+            worker.cancel()
+        await asyncio.gather(*self._workers.values(), return_exceptions=True)
+        self._workers.clear()
+        self._wakeups.clear()
+        self._queues.clear()
+        self._triggers.clear()
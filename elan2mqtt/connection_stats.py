@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+##########################################################################
+#
+# Statistics of HTTP connections to eLan (aiohttp TraceConfig)
+#
+# - how many requests reused keep-alive connection and how many had to
+#   open new TCP connection (and how long it took)
+# - how long requests waited for free connection in connector queue
+# - how long requests took (until response headers)
+#
+##########################################################################
+
+import asyncio
+
+import aiohttp
+
+
+class ConnectionStats:
+    """Collect connection statistics of ClientSession.
+
+    Use: aiohttp.ClientSession(trace_configs=[stats.trace_config()])
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.request_time = 0.0
+        self.request_time_max = 0.0
+        self.created = 0
+        self.create_time = 0.0
+        self.reused = 0
+        self.queued = 0
+        self.queue_time = 0.0
+        self.queue_time_max = 0.0
+
+    def trace_config(self):
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self._on_request_start)
+        trace_config.on_request_end.append(self._on_request_end)
+        trace_config.on_connection_create_start.append(self._on_connection_create_start)
+        trace_config.on_connection_create_end.append(self._on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(self._on_connection_reuseconn)
+        trace_config.on_connection_queued_start.append(self._on_connection_queued_start)
+        trace_config.on_connection_queued_end.append(self._on_connection_queued_end)
+        return trace_config
+
+    @property
+    def reuse_ratio(self):
+        connections = self.created + self.reused
+        return self.reused / connections if connections else 0.0
+
+    def stats(self):
+        return {'requests': self.requests,
+                'avg_request': round(self.request_time / self.requests, 4) if self.requests else 0.0,
+                'max_request': round(self.request_time_max, 4),
+                'created': self.created, 'reused': self.reused,
+                'reuse_ratio': round(self.reuse_ratio, 3),
+                'avg_create': round(self.create_time / self.created, 4) if self.created else 0.0,
+                'queued': self.queued,
+                'avg_queue_wait': round(self.queue_time / self.queued, 4) if self.queued else 0.0,
+                'max_queue_wait': round(self.queue_time_max, 4)}
+
+    # trace_config_ctx is created by aiohttp for every request
+
+    async def _on_request_start(self, session, ctx, params):
+        ctx.request_start = asyncio.get_event_loop().time()
+
+    async def _on_request_end(self, session, ctx, params):
+        duration = asyncio.get_event_loop().time() - ctx.request_start
+        self.requests += 1
+        self.request_time += duration
+        if duration > self.request_time_max:
+            self.request_time_max = duration
+
+    async def _on_connection_create_start(self, session, ctx, params):
+        ctx.create_start = asyncio.get_event_loop().time()
+
+    async def _on_connection_create_end(self, session, ctx, params):
+        self.created += 1
+        self.create_time += asyncio.get_event_loop().time() - ctx.create_start
+
+    async def _on_connection_reuseconn(self, session, ctx, params):
+        self.reused += 1
+
+    async def _on_connection_queued_start(self, session, ctx, params):
+        ctx.queued_start = asyncio.get_event_loop().time()
+
+    async def _on_connection_queued_end(self, session, ctx, params):
+        duration = asyncio.get_event_loop().time() - ctx.queued_start
+        self.queued += 1
+        self.queue_time += duration
+        if duration > self.queue_time_max:
+            self.queue_time_max = duration
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+##########################################################################
+#
+# Persistent (warm start) cache of eLan devices
+#
+# Cache is JSON file keyed by eLan device id:
+#   {"devices": {"12345": {"url": ..., "info": {...}, "state": {...},
+#                          "raw": "state as sent by eLan",
+#                          "discovery": [topics of published discovery],
+#                          "discovery digest": digest of the messages}}}
+#
+# Raw state (bytes, passthrough mode) is kept as it is and parsed only
+# when the cache is saved (or the state is read). Warm start publishes
+# it as it is, so its hash matches states read from eLan later.
+#
+# After restart the gateway can set up devices and publish last known
+# state straight from the cache and revalidate it against eLan later.
+#
+##########################################################################
+
+import asyncio
+import copy
+import logging
+import os
+
+import json_codec
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceCache:
+    """Device info and last published state stored in JSON file.
+
+    Empty path disables the cache (nothing is loaded or saved).
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._devices = {}
+        # devices with raw state not parsed yet
+        self._unparsed = set()
+        self._dirty = False
+
+    @property
+    def enabled(self):
+        return bool(self._path)
+
+    def load(self):
+        """Load cache from file. Missing or broken file results in empty cache."""
+        self._devices = {}
+        self._unparsed = set()
+        if not self.enabled:
+            return
+        try:
+            with open(self._path, 'r', encoding='utf-8') as f:
+                self._devices = json_codec.loads(f.read())['devices']
+            logger.info("Loaded %d devices from cache %s" % (len(self._devices), self._path))
+        except FileNotFoundError:
+            logger.info("No device cache at " + self._path)
+        except (ValueError, KeyError, TypeError, OSError):
+            logger.exception("Device cache " + self._path + " is broken, ignoring it")
+
+    def device_list(self):
+        """Cached devices in format of /api/devices response with 'info' filled in"""
+        return {device: {'url': entry['url'], 'info': copy.deepcopy(entry['info'])}
+                for device, entry in self._devices.items() if 'info' in entry}
+
+    def info(self, device):
+        return self._devices.get(device, {}).get('info')
+
+    def state(self, device):
+        if device in self._unparsed:
+            self._parse(device)
+        return self._devices.get(device, {}).get('state')
+
+    def raw(self, device):
+        """State as sent by eLan (bytes) or None when only parsed state is known"""
+        raw = self._devices.get(device, {}).get('raw')
+        return raw.encode('utf-8') if raw is not None else None
+
+    def discovery(self, device):
+        return self._devices.get(device, {}).get('discovery', [])
+
+    def discovery_digest(self, device):
+        return self._devices.get(device, {}).get('discovery digest')
+
+    def update_discovery(self, device, topics, digest):
+        entry = self._devices.get(device)
+        if entry is not None and (entry.get('discovery') != topics or entry.get('discovery digest') != digest):
+            entry['discovery'] = topics
+            entry['discovery digest'] = digest
+            self._dirty = True
+
+    def update_info(self, device, url, info):
+        entry = self._devices.setdefault(device, {})
+        if entry.get('url') != url or entry.get('info') != info:
+            # keep own copy - info in device registry gets modified
+            entry['url'] = url
+            entry['info'] = copy.deepcopy(info)
+            self._dirty = True
+
+    def update_state(self, device, state):
+        """Store state of device - dict or raw bytes (parsed later)"""
+        entry = self._devices.get(device)
+        if entry is None:
+            return
+        if isinstance(state, (bytes, bytearray)):
+            raw = bytes(state).decode('utf-8', 'replace')
+            if entry.get('raw') != raw:
+                entry['raw'] = raw
+                self._unparsed.add(device)
+                self._dirty = True
+        elif entry.get('state') != state or 'raw' in entry:
+            entry['state'] = state
+            entry.pop('raw', None)
+            self._unparsed.discard(device)
+            self._dirty = True
+
+    def _parse(self, device):
+        self._unparsed.discard(device)
+        entry = self._devices.get(device)
+        if entry is None:
+            return
+        try:
+            entry['state'] = json_codec.loads(entry['raw'])
+        except ValueError:
+            logger.warning("State of device " + device + " is not valid JSON, not cached")
+            entry.pop('state', None)
+            entry.pop('raw', None)
+
+    def retain(self, devices):
+        """Drop devices which are not in devices (e.g. removed from eLan)"""
+        for device in list(self._devices):
+            if device not in devices:
+                del self._devices[device]
+                self._unparsed.discard(device)
+                self._dirty = True
+
+    def _write(self, data):
+        tmp_path = self._path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        # atomic replace - crash during write never leaves broken cache
+        os.replace(tmp_path, self._path)
+
+    async def save(self):
+        """Write cache to file (only when something changed)"""
+        if not self.enabled or not self._dirty:
+            return
+        self._dirty = False
+        for device in list(self._unparsed):
+            self._parse(device)
+        data = json_codec.dumps({'devices': self._devices})
+        try:
+            await asyncio.get_event_loop().run_in_executor(None, self._write, data)
+        except OSError:
+            self._dirty = True
+            logger.exception("Saving device cache " + self._path + " failed")
@@ -0,0 +1,723 @@
+# -*- coding: utf-8 -*-
+
+##########################################################################
+#
+# Home Assistant discovery
+#
+# Discovery is driven by registry of device profiles (PROFILES below).
+# Each profile says which devices it matches (by eLan device type or
+# product type) and which HA entities are announced for them.
+# Adding support for new device means adding new profile (or entity)
+# entry, no code changes are needed.
+#
+# - devices are classified once per distinct (type, product type,
+#   primary actions) combination, further lookups are dict lookups
+# - discovery payloads of device are serialized once and reused until
+#   info of the device changes
+#
+# Two output modes are supported:
+# - 'component' - one message per entity (homeassistant/<component>/...)
+# - 'device' - one message per device with all its entities
+#   (homeassistant/device/<mac>/config, needs HA 2024.11+)
+# Both can use abbreviated keys to make messages shorter.
+#
+# Topics published for each device are remembered, topics which are no
+# longer published (mode switch, entity dropped after info change) get
+# empty retained message so homeassistant removes their entities.
+# Digest of published messages tells whether they have to be published
+# again after restart.
+#
+##########################################################################
+
+import hashlib
+import string
+
+import json_codec
+
+##########################################################################################
+# Device info library
+##########################################################################################
+#
+##########################################################################################
+# RFUS-61 - singel channel multi function relay
+##########################################################################################
+# {"device info":{"type":"appliance","product type":"RFUS-61","address":123456,"label":"xxxx","vote":false},
+# 	"actions info": {
+# 		"on": {
+# 			"type": "bool"
+# 		},
+# 		"delayed off": {
+# 			"type": null
+# 		},
+# 		"delayed on": {
+# 			"type": null
+# 		},
+# 		"delayed off: set time": {
+# 			"type": "int",
+# 			"min": 2,
+# 			"max": 3600,
+# 			"step": 1
+# 		},
+# 		"delayed on: set time": {
+# 			"type": "int",
+# 			"min": 2,
+# 			"max": 3600,
+# 			"step": 1
+# 		},
+# 		"automat": {
+# 			"type": "bool"
+# 		} 
+# 	},
+# 	"primary actions": ["on"],
+# 	"secondary actions": [["delayed off", "delayed off: set time"], ["delayed on", "delayed on: set time"],"automat"],
+# 	"settings": {
+# 	"delayed off: set time": 2400,
+# 	"delayed on: set time": 2
+# 	},"id":"13212"}
+#
+# State:
+# {
+# 	"on": false,
+# 	"delay": false,
+# 	"automat": false,
+# 	"locked": false,
+# 	"delayed off: set time": 2400,
+# 	"delayed on: set time": 2
+# }
+
+##########################################################################################
+# RFSA-66M - six channel multifunction relay (each channel is reported as separate device)
+########################################################################################
+# {"id":"16619","device info":{"address":123456,"label":"xxxxx","type":"irrigation","product type":"RFSA-66M"},
+# 	"actions info": {
+# 		"on": {
+# 			"type": "bool"
+# 		},
+# 		"delayed off": {
+# 			"type": null
+# 		},
+# 		"delayed on": {
+# 			"type": null
+# 		},
+# 		"delayed off: set time": {
+# 			"type": "int",
+# 			"min": 2,
+# 			"max": 3600,
+# 			"step": 1
+# 		},
+# 		"delayed on: set time": {
+# 			"type": "int",
+# 			"min": 2,
+# 			"max": 3600,
+# 			"step": 1
+# 		},
+# 		"automat": {
+# 			"type": "bool"
+# 		} 
+# 	},
+# 	"primary actions": ["on"],
+# 	"secondary actions": [["delayed off", "delayed off: set time"], ["delayed on", "delayed on: set time"],"automat"],
+# 	"settings": {
+# 	"delayed off: set time": 1800,
+# 	"delayed on: set time": 0
+# 	}
+# }
+# State:
+# {
+# 	"on": false,
+# 	"delay": false,
+# 	"automat": false,
+# 	"locked": false,
+# 	"delayed off: set time": 1800,
+# 	"delayed on: set time": 0
+# }
+##########################################################################################
+# RFSA-11B - single channel single function relay 
+########################################################################################
+# {"id":"18457","device info":{"address":123456,"label":"abc","type":"appliance","product type":"RFSA-11B"},
+# 	"actions info": {
+# 		"on": {
+# 			"type": "bool"
+# 		},
+# 		"automat": {
+# 			"type": "bool"
+# 		} 
+# 	},
+# 	"primary actions": ["on"],
+# 	"secondary actions": ["automat"],
+# 	"settings": {}
+# }
+# State:
+# {
+# 	"on": true,
+# 	"automat": true,
+# 	"locked": false
+# }
+##########################################################################################
+# RFSA-62B - dual channel multifunction relay 
+########################################################################################
+# {
+# 	"id": "43124","device info":{"type":"appliance","product type":"RFSA-62B","address":123456,"label":"abc"},
+# 	"actions info": {
+# 		"on": {
+# 			"type": "bool"
+# 		},
+# 		"delayed off": {
+# 			"type": null
+# 		},
+# 		"delayed on": {
+# 			"type": null
+# 		},
+# 		"delayed off: set time": {
+# 			"type": "int",
+# 			"min": 2,
+# 			"max": 3600,
+# 			"step": 1
+# 		},
+# 		"delayed on: set time": {
+# 			"type": "int",
+# 			"min": 2,
+# 			"max": 3600,
+# 			"step": 1
+# 		},
+# 		"automat": {
+# 			"type": "bool"
+# 		} 
+# 	},
+# 	"primary actions": ["on"],
+# 	"secondary actions": [["delayed off", "delayed off: set time"], ["delayed on", "delayed on: set time"],"automat"],
+# 	"settings": {
+# 	"delayed off: set time": 15,
+# 	"delayed on: set time": 0
+# 	}
+# }
+# State:
+# {
+# 	"on": false,
+# 	"delay": false,
+# 	"automat": false,
+# 	"locked": false,
+# 	"delayed off: set time": 15,
+# 	"delayed on: set time": 0
+# }
+##########################################################################################
+# RFSAI-61B - singel channel multi function relay with button
+##########################################################################################
+# {
+# 	"id": "41008", "device info": {"type": "ventilation", "product type": "RFSAI-61B", "address": 123456, "label": "abc", "vote": false},
+# 	"actions info": {
+# 		"on": {
+# 			"type": "bool"
+# 		},
+# 		"delayed off": {
+# 			"type": null
+# 		},
+# 		"delayed on": {
+# 			"type": null
+# 		},
+# 		"delayed off: set time": {
+# 			"type": "int",
+# 			"min": 2,
+# 			"max": 3600,
+# 			"step": 1
+# 		},
+# 		"delayed on: set time": {
+# 			"type": "int",
+# 			"min": 2,
+# 			"max": 3600,
+# 			"step": 1
+# 		},
+# 		"automat": {
+# 			"type": "bool"
+# 		}
+# 	},
+# 	"primary actions": ["on"],
+# 	"secondary actions": [["delayed off", "delayed off: set time"], ["delayed on", "delayed on: set time"], "automat"],
+# 	"settings": {
+#             "delayed off: set time": 2,
+#             "delayed on: set time": 2
+# 	}
+# }
+# State:
+# {
+# 	"on": false,
+# 	"delay": false,
+# 	"automat": false,
+# 	"locked": false,
+# 	"delayed off: set time": 2,
+# 	"delayed on: set time": 2
+# }
+
+##########################################################################################
+# RFSF-1B - flood detector
+##########################################################################################
+# {"id":"55275","device info":{"address":239860,"label":"Voda","type":"flood detector","product type":"RFSF-1B"},
+# 	"actions info": {
+# 		"automat": {
+# 			"type": "bool"
+# 		},
+# 		"deactivate": {
+# 			"type": null
+# 		},
+# 		"disarm": {
+# 			"type": "bool"
+# 		} 
+# 	},
+# 	"primary actions": ["deactivate","disarm"],
+# 	"secondary actions": ["automat"],
+# 	"settings": {
+# 	"disarm": false
+# 	}
+# }
+# State:
+# {
+# 	"alarm": false,
+# 	"detect": false,
+# 	"automat": true,
+# 	"battery": true,
+# 	"disarm": false
+# }
+
+
+##########################################################################################
+# Device profiles
+##########################################################################################
+#
+# match / when conditions - condition is met when ANY of listed rules is met:
+#   'types'            - substring of eLan device type ('light' matches 'dimmed light')
+#   'types_exact'      - eLan device type
+#   'products'         - product type
+#   'product_contains' - substring of product type
+#   'primary_actions'  - primary action of device
+# 'group' - only the first matching profile of the group is used
+#
+# entity:
+#   'component' - HA component (light, switch, sensor, ...)
+#   'object'    - suffix of discovery topic and unique_id ('' for main entity)
+#   'kind'      - device kind used in device identifiers (eLan-<kind>-<mac>)
+#   'when'      - entity is announced only when condition is met
+#   'icons'     - list of (condition, label, icon), last matching icon wins;
+#                 label (if set) must be also contained in device label (lower case)
+#   'config'    - discovery message; $label, $mac, $status_topic,
+#                 $control_topic, $product and $brightness_max are substituted
+#
+# Note: HA templates use {{ }} and {% %} so $ substitution is used
+
+# User should set type to light. But sometimes...
+# That is why we will always treat RFDA-11B as a light dimmer
+LIGHT = {
+    'name': 'light',
+    'group': 'actuator',
+    'match': {'types': ['light', 'lamp'], 'products': ['RFDA-11B']},
+    'entities': [
+        {
+            'component': 'light',
+            'object': '',
+            'kind': 'light',
+            'when': {'primary_actions': ['on']},
+            'config': {
+                'schema': 'basic',
+                'name': '$label',
+                'unique_id': 'eLan-$mac',
+                'command_topic': '$control_topic',
+                'state_topic': '$status_topic',
+                'json_attributes_topic': '$status_topic',
+                'payload_off': '{"on":false}',
+                'payload_on': '{"on":true}',
+                'state_value_template':
+                '{%- if value_json.on -%}{"on":true}{%- else -%}{"on":false}{%- endif -%}'
+            }
+        },
+        {
+            # dimmer replaces basic light (the same discovery topic)
+            'component': 'light',
+            'object': '',
+            'kind': 'dimmer',
+            'when': {'primary_actions': ['brightness'], 'products': ['RFDA-11B']},
+            'config': {
+                'schema': 'template',
+                'name': '$label',
+                'unique_id': 'eLan-$mac',
+                'state_topic': '$status_topic',
+                'command_topic': '$control_topic',
+                'command_on_template':
+                '{%- if brightness is defined -%} {"brightness": {{ (brightness * '
+                '$brightness_max / 255 ) | int }} } {%- else -%} {"brightness": 100 } {%- endif -%}',
+                'command_off_template': '{"brightness": 0 }',
+                'state_template':
+                '{%- if value_json.brightness > 0 -%}on{%- else -%}off{%- endif -%}',
+                'brightness_template':
+                '{{ (value_json.brightness * 255 / $brightness_max) | int }}'
+            }
+        },
+    ]
+}
+
+#
+# Switches
+# RFSA-6xM units and "appliance" class of eLan
+# Note: handled in the same group as lights (after them) to avoid lights on RFSA-6xM units
+SWITCH = {
+    'name': 'switch',
+    'group': 'actuator',
+    'match': {'types': ['appliance'],
+              'products': ['RFSA-61M', 'RFSA-66M', 'RFSA-11B', 'RFUS-61', 'RFSA-62B']},
+    'entities': [
+        {
+            # "on" primary action is required for switches
+            'component': 'switch',
+            'object': '',
+            'kind': 'switch',
+            'when': {'primary_actions': ['on']},
+            'config': {
+                'schema': 'basic',
+                'name': '$label',
+                'unique_id': 'eLan-$mac',
+                'command_topic': '$control_topic',
+                'state_topic': '$status_topic',
+                'json_attributes_topic': '$status_topic',
+                'payload_off': '{"on":false}',
+                'payload_on': '{"on":true}',
+                'state_off': 'off',
+                'state_on': 'on',
+                'value_template':
+                '{%- if value_json.on -%}on{%- else -%}off{%- endif -%}'
+            }
+        },
+    ]
+}
+
+
+def temperature_sensor(kind, side):
+    return {
+        'component': 'sensor',
+        'object': side,
+        'kind': kind,
+        'config': {
+            'name': '${label}-' + side,
+            'unique_id': 'eLan-$mac-' + side,
+            'device_class': 'temperature',
+            'state_topic': '$status_topic',
+            'json_attributes_topic': '$status_topic',
+            'value_template': '{{ value_json["temperature ' + side + '"] }}',
+            'unit_of_measurement': '°C'
+        }
+    }
+
+
+#
+# Thermostats
+#
+# User should set type to heating. But sometimes...
+# That is why we will always treat RFSTI-11G a temperature sensor/thermostat
+#
+THERMOSTAT = {
+    'name': 'thermostat',
+    'match': {'types_exact': ['heating'], 'products': ['RFSTI-11G']},
+    'entities': [
+        temperature_sensor('thermostat', 'IN'),
+        temperature_sensor('thermostat', 'OUT'),
+        #
+        # Note - needs to be converted to CLIMATE class
+        #
+        {
+            'component': 'sensor',
+            'object': 'ON',
+            'kind': 'thermostat',
+            'config': {
+                'name': '$label-ON',
+                'unique_id': 'eLan-$mac-ON',
+                'state_topic': '$status_topic',
+                'json_attributes_topic': '$status_topic',
+                'value_template':
+                '{%- if value_json.on -%}on{%- else -%}off{%- endif -%}'
+            }
+        },
+    ]
+}
+
+#
+# Thermometers
+#
+# User should set type to thermometer. But sometimes...
+#
+THERMOMETER = {
+    'name': 'thermometer',
+    'match': {'types_exact': ['thermometer'], 'products': ['RFTI-10B']},
+    'entities': [
+        temperature_sensor('thermometer', 'IN'),
+        temperature_sensor('thermometer', 'OUT'),
+    ]
+}
+
+
+def detector_sensor(item, icon, when, value_template=None):
+    if value_template is None:
+        value_template = '{%- if value_json.' + item + ' -%}on{%- else -%}off{%- endif -%}'
+    return {
+        'component': 'sensor',
+        'object': item,
+        'kind': 'detector',
+        'when': when,
+        'config': {
+            'name': '${label}' + item,
+            'unique_id': 'eLan-$mac-' + item,
+            'icon': icon,
+            'state_topic': '$status_topic',
+            'json_attributes_topic': '$status_topic',
+            'value_template': value_template
+        }
+    }
+
+
+#
+# Detectors
+#
+# RFWD-100 status messages
+# {alarm: true, detect: false, tamper: “closed”, automat: false, battery: true, disarm: false}
+# {alarm: true, detect: true, tamper: “closed”, automat: false, battery: true, disarm: false}
+# RFSF-1B status message
+# {"alarm": false,	"detect": false, "automat": true, "battery": true, "disarm": false }
+DETECTOR = {
+    'name': 'detector',
+    'match': {'types': ['detector'], 'product_contains': ['RFWD-', 'RFSD-', 'RFMD-', 'RFSF-']},
+    'entities': [
+        {
+            # Silently expect that all detectors provide "detect" action
+            'component': 'sensor',
+            'object': '',
+            'kind': 'detector',
+            # A wild guess of icon
+            'icons': [
+                ({'types': ['window'], 'product_contains': ['RFWD-']}, None, 'mdi:window-open'),
+                ({'types': ['window'], 'product_contains': ['RFWD-']}, 'door', 'mdi:door-open'),
+                ({'types': ['smoke'], 'product_contains': ['RFSD-']}, None, 'mdi:smoke-detector'),
+                ({'types': ['motion'], 'product_contains': ['RFMD-']}, None, 'mdi:motion-sensor'),
+                ({'types': ['flood'], 'product_contains': ['RFSF-']}, None, 'mdi:waves'),
+            ],
+            'config': {
+                'name': '$label',
+                'unique_id': 'eLan-$mac',
+                'state_topic': '$status_topic',
+                'json_attributes_topic': '$status_topic',
+                'value_template':
+                '{%- if value_json.detect -%}on{%- else -%}off{%- endif -%}'
+            }
+        },
+        {
+            # Silently expect that all detectors provide "battery" status
+            'component': 'sensor',
+            'object': 'battery',
+            'kind': 'detector',
+            'config': {
+                'name': '${label}battery',
+                'unique_id': 'eLan-$mac-battery',
+                'device_class': 'battery',
+                'state_topic': '$status_topic',
+                'value_template':
+                '{%- if value_json.battery -%}100{%- else -%}0{%- endif -%}'
+            }
+        },
+        detector_sensor('alarm', 'mdi:alarm-light', {'products': ['RFWD-100', 'RFSF-1B']}),
+        # RFWD window/door detector
+        detector_sensor('tamper', 'mdi:gesture-tap', {'products': ['RFWD-100']},
+                        '{%- if value_json.tamper == "opened" -%}on{%- else -%}off{%- endif -%}'),
+        detector_sensor('automat', 'mdi:arrow-decision-auto', {'products': ['RFWD-100']}),
+        detector_sensor('disarm', 'mdi:lock-alert', {'products': ['RFWD-100']}),
+    ]
+}
+
+PROFILES = [LIGHT, SWITCH, THERMOSTAT, THERMOMETER, DETECTOR]
+
+
+# Abbreviations of discovery keys supported by HA
+ABBREVIATIONS = {
+    'brightness_template': 'bri_tpl',
+    'command_off_template': 'cmd_off_tpl',
+    'command_on_template': 'cmd_on_tpl',
+    'command_topic': 'cmd_t',
+    'components': 'cmps',
+    'connections': 'cns',
+    'device': 'dev',
+    'device_class': 'dev_cla',
+    'icon': 'ic',
+    'identifiers': 'ids',
+    'json_attributes_topic': 'json_attr_t',
+    'origin': 'o',
+    'payload_off': 'pl_off',
+    'payload_on': 'pl_on',
+    'platform': 'p',
+    'state_off': 'stat_off',
+    'state_on': 'stat_on',
+    'state_template': 'stat_tpl',
+    'state_topic': 'stat_t',
+    'state_value_template': 'stat_val_tpl',
+    'unique_id': 'uniq_id',
+    'unit_of_measurement': 'unit_of_meas',
+    'value_template': 'val_tpl',
+}
+
+# Options shared by all components of device can be set once for device
+# (device mode only)
+SHARED_OPTIONS = ('state_topic', 'command_topic', 'json_attributes_topic')
+
+
+def _matches(rules, device_type, product, primary_actions):
+    """Is any of the rules met?"""
+    return (any(item in device_type for item in rules.get('types', ()))
+            or device_type in rules.get('types_exact', ())
+            or product in rules.get('products', ())
+            or any(item in product for item in rules.get('product_contains', ()))
+            or any(item in primary_actions for item in rules.get('primary_actions', ())))
+
+
+def _compile(entity):
+    """Precompile templates of entity config"""
+    compiled = dict(entity)
+    compiled['config'] = [(key, string.Template(value) if isinstance(value, str) else value)
+                          for key, value in entity['config'].items()]
+    compiled['topic'] = string.Template('homeassistant/' + entity['component'] + '/$mac'
+                                        + ('/' + entity['object'] if entity['object'] else '') + '/config')
+    return compiled
+
+
+def _abbreviate(value):
+    """Replace discovery keys by their abbreviations (recursively)"""
+    if isinstance(value, dict):
+        return {ABBREVIATIONS.get(key, key): _abbreviate(item) for key, item in value.items()}
+    return value
+
+
+class DiscoveryRegistry:
+    """Classify devices by profiles and build (cached) discovery messages
+
+    mode is 'component' or 'device', abbreviate shortens keys of messages.
+    """
+
+    def __init__(self, profiles=PROFILES, mode='component', abbreviate=False):
+        if mode not in ('component', 'device'):
+            raise ValueError('Unknown discovery mode ' + str(mode))
+        self._mode = mode
+        self._abbreviate = abbreviate
+        self._profiles = [dict(profile, entities=[_compile(entity) for entity in profile['entities']])
+                          for profile in profiles]
+        self._classes = {}
+        self._payloads = {}
+        self._published = {}
+
+    def classify(self, info):
+        """Return list of entities announced for device with given info"""
+        device_info = info['device info']
+        key = (device_info.get('type', ''), device_info.get('product type', '---'),
+               tuple(info.get('primary actions', ())))
+        entities = self._classes.get(key)
+        if entities is None:
+            entities = []
+            groups = set()
+            for profile in self._profiles:
+                group = profile.get('group')
+                if group in groups or not _matches(profile['match'], *key):
+                    continue
+                if group is not None:
+                    groups.add(group)
+                entities.extend(entity for entity in profile['entities']
+                                if 'when' not in entity or _matches(entity['when'], *key))
+            self._classes[key] = entities
+        return entities
+
+    def payloads(self, mac, device):
+        """Return list of (topic, payload bytes) of device from registry (d[mac])"""
+        info = device['info']
+        cached = self._payloads.get(mac)
+        if cached is not None and (cached[0] is info or cached[0] == info):
+            self._payloads[mac] = (info, cached[1])
+            return cached[1]
+
+        device_info = info['device info']
+        device_type = device_info.get('type', '')
+        product = device_info.get('product type', '---')
+        label = str(device_info['label'])
+        variables = {
+            'label': label,
+            'mac': mac,
+            'status_topic': device['status_topic'],
+            'control_topic': device['control_topic'],
+            'product': product,
+            'brightness_max': str(info.get('actions info', {}).get('brightness', {}).get('max', 100)),
+        }
+        components = []
+        for entity in self.classify(info):
+            config = {key: (value.safe_substitute(variables) if isinstance(value, string.Template) else value)
+                      for key, value in entity['config']}
+            config['device'] = {
+                'name': label,
+                'identifiers': 'eLan-' + entity['kind'] + '-' + mac,
+                'connections': [["mac", mac]],
+                'mf': 'Elko EP',
+                'mdl': product
+            }
+            icon = ''
+            for condition, label_part, condition_icon in entity.get('icons', ()):
+                if (_matches(condition, device_type, product, ())
+                        and (label_part is None or label_part in label.lower())):
+                    icon = condition_icon
+            if icon:
+                config['icon'] = icon
+            components.append((entity, config))
+
+        if self._mode == 'device':
+            payloads = self._device_payload(mac, components)
+        else:
+            payloads = [(entity['topic'].substitute(mac=mac), self._serialize(config))
+                        for entity, config in components]
+        self._payloads[mac] = (info, payloads)
+        return payloads
+
+    def _device_payload(self, mac, components):
+        """Merge entities of device into single device discovery message"""
+        if not components:
+            return []
+        # later entity of the same component replaces the earlier one (as the
+        # same discovery topic does in component mode), so does its device
+        merged = {}
+        device = None
+        for entity, config in components:
+            device = config.pop('device')
+            config['platform'] = entity['component']
+            merged[entity['component'] + ('_' + entity['object'] if entity['object'] else '')] = config
+        message = {'device': device, 'origin': {'name': 'elan2mqtt'}}
+        for option in SHARED_OPTIONS:
+            values = [config.get(option) for config in merged.values()]
+            if values[0] is not None and values.count(values[0]) == len(values):
+                message[option] = values[0]
+                for config in merged.values():
+                    del config[option]
+        message['components'] = merged
+        return [('homeassistant/device/' + mac + '/config', self._serialize(message))]
+
+    def _serialize(self, message):
+        if self._abbreviate:
+            message = _abbreviate(message)
+        return json_codec.dumpb(message, compact=self._abbreviate)
+
+    @staticmethod
+    def digest(payloads):
+        """Digest of discovery messages (list of (topic, payload bytes)) of device"""
+        digest = hashlib.sha1()
+        for topic, payload in payloads:
+            digest.update(topic.encode('utf-8') + b'\0' + payload + b'\0')
+        return digest.hexdigest()
+
+    def restore(self, mac, topics):
+        """Set topics published for device earlier (by previous run of the gateway)"""
+        self._published[mac] = list(topics)
+
+    def published(self, mac, topics):
+        """Remember topics published for device, return earlier published topics which are not among them"""
+        previous = self._published.get(mac, ())
+        self._published[mac] = list(topics)
+        return [topic for topic in previous if topic not in topics]
+
+    def forget(self, mac):
+        self._payloads.pop(mac, None)
+        self._published.pop(mac, None)
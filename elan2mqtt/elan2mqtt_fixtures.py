@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+##########################################################################
+#
+# pytest fixtures: MQTT broker stand-in and eLan simulator
+#
+# Built on the vendored aiohttp pytest plugin (its loop fixture), enable
+# both in conftest.py of the tests (see tests/conftest.py):
+#
+#   pytest_plugins = ['aiohttp.pytest_plugin', 'elan2mqtt_fixtures']
+#
+#   async def test_command(mqtt_broker, elan_simulator):
+#       broker = await mqtt_broker()
+#       simulator = await elan_simulator(devices=10)
+#       ... run gateway against mqtt://127.0.0.1:<broker.port> and
+#           simulator.url ...
+#       await broker.wait_for('eLan/+/status', count=10)
+#
+##########################################################################
+
+import pytest
+
+from elan_simulator import ElanSimulator
+from mqtt_broker import MqttBroker
+
+
+@pytest.fixture
+def mqtt_broker(loop):
+    """Factory starting MqttBroker on random port: await mqtt_broker(on_publish=None)"""
+    brokers = []
+
+    async def go(on_publish=None, host='127.0.0.1', port=0):
+        broker = MqttBroker(on_publish)
+        await broker.start(host, port)
+        brokers.append(broker)
+        return broker
+
+    yield go
+
+    async def finalize():
+        while brokers:
+            await brokers.pop().stop()
+
+    loop.run_until_complete(finalize())
+
+
+@pytest.fixture
+def elan_simulator(loop):
+    """Factory starting ElanSimulator on random port: await elan_simulator(devices=10, ...)"""
+    simulators = []
+
+    async def go(*args, **kwargs):
+        simulator = ElanSimulator(*args, **kwargs)
+        await simulator.start()
+        simulators.append(simulator)
+        return simulator
+
+    yield go
+
+    async def finalize():
+        while simulators:
+            await simulators.pop().stop()
+
+    loop.run_until_complete(finalize())
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+##########################################################################
+#
+# eLan authentication
+#
+# From firmware v 3.0. the password is hashed (SHA1), older firmwares
+# work without authentication. Successful login results in AuthID cookie
+# stored in session cookie jar.
+#
+# - only one login runs at a time, all callers needing it wait for it
+# - caller which already knows the session expired (got 401) skips
+#   the probe requests and goes straight to POST /login
+# - failed login (rejected or network error) is retried with exponential
+#   backoff (limited attempts)
+# - session is renewed in background before AuthID cookie expires
+#   (eLan session expires in 0.5 h), so requests do not run into 401
+#
+##########################################################################
+
+import asyncio
+import hashlib
+import logging
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+class ElanAuthenticator:
+    """Log in to eLan using session (aiohttp.ClientSession with cookie jar)
+
+    login_observer (optional) is called with duration in s of every POST /login.
+    """
+
+    def __init__(self, session, elan_url, name, password, attempts=5, max_delay=30, login_observer=None):
+        self._session = session
+        self._elan_url = elan_url
+        self._credentials = {
+            'name': name,
+            'key': hashlib.sha1(password).hexdigest()
+        }
+        self._attempts = attempts
+        self._max_delay = max_delay
+        self._login_observer = login_observer
+        self._login_task = None
+        # incremented with every successful login
+        self.generation = 0
+        # AuthID cookie seen in cookie jar and time it was first seen
+        self._cookie = None
+        self._cookie_issued = 0.0
+        self.logins = 0
+        self.renewals = 0
+        self.failures = 0
+        self.last_duration = 0.0
+        self.total_duration = 0.0
+
+    def stats(self):
+        return {'logins': self.logins, 'renewals': self.renewals, 'failures': self.failures,
+                'last_duration': round(self.last_duration, 3),
+                'total_duration': round(self.total_duration, 3)}
+
+    @staticmethod
+    def is_expired(resp):
+        """Does eLan response mean that session expired?"""
+        return resp.status in (401, 403)
+
+    async def login(self):
+        """Make sure we are authenticated (probes eLan first)"""
+        await self._single_login(probe=True)
+
+    async def relogin(self, generation):
+        """Log in again after request failed due to expired session.
+
+        generation is value of self.generation before the failed request.
+        When somebody logged in since then no new login is done.
+        """
+        if generation != self.generation:
+            return
+        await self._single_login(probe=False)
+
+    def _auth_cookie(self):
+        """Return AuthID cookie (Morsel) from cookie jar and track its age"""
+        for cookie in self._session.cookie_jar:
+            if cookie.key == 'AuthID':
+                if self._cookie is None or cookie.value != self._cookie.value:
+                    self._cookie_issued = asyncio.get_event_loop().time()
+                self._cookie = cookie
+                return cookie
+        self._cookie = None
+        return None
+
+    async def renew_session(self, lifetime=30 * 60, renew_before=5 * 60):
+        """Renew session forever, renew_before s before AuthID cookie expires.
+
+        Cookie is expected to expire after lifetime s unless it sets max-age.
+        """
+        loop = asyncio.get_event_loop()
+        while True:
+            cookie = self._auth_cookie()
+            if cookie is None:
+                # not logged in yet or old firmware without authentication
+                await asyncio.sleep(renew_before)
+                continue
+            cookie_lifetime = lifetime
+            if cookie['max-age']:
+                cookie_lifetime = int(cookie['max-age'])
+            # short lived sessions are renewed in half of their lifetime
+            margin = min(renew_before, cookie_lifetime / 2)
+            delay = self._cookie_issued + cookie_lifetime - margin - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                # cookie might have been renewed meanwhile (e.g. relogin after 401)
+                continue
+            try:
+                logger.info("Renewing eLan session (AuthID cookie is %d s old)"
+                            % (loop.time() - self._cookie_issued))
+                await self._single_login(probe=False)
+                self.renewals += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Renewal of eLan session failed")
+                await asyncio.sleep(60)
+
+    async def _single_login(self, probe):
+        if self._login_task is None:
+            self._login_task = asyncio.ensure_future(self._login(probe))
+            self._login_task.add_done_callback(self._login_done)
+        # waiter being cancelled must not cancel login shared with others
+        await asyncio.shield(self._login_task)
+
+    def _login_done(self, task):
+        self._login_task = None
+
+    async def _authenticated(self):
+        async with self._session.get(self._elan_url + '/api', timeout=3) as resp:
+            return resp.status == 200
+
+    async def _login(self, probe):
+        loop = asyncio.get_event_loop()
+        started = loop.time()
+        if probe:
+            logger.info("Get main/login page (to get cookies)")
+            async with self._session.get(self._elan_url + '/', timeout=3):
+                pass
+
+            logger.info("Are we already authenticated? E.g. API check")
+            if await self._authenticated():
+                self.generation += 1
+                return
+
+        delay = 1
+        for attempt in range(self._attempts):
+            if attempt > 0:
+                logger.warning("Login to eLan failed, next attempt in %d s" % delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self._max_delay)
+            # perfrom login
+            # it should result in new AuthID cookie
+            logger.info("Authenticating to eLAN")
+            request_started = loop.time()
+            try:
+                async with self._session.post(self._elan_url + '/login', data=self._credentials, timeout=3):
+                    pass
+                if self._login_observer is not None:
+                    self._login_observer(loop.time() - request_started)
+                authenticated = await self._authenticated()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning("Login request to eLan failed: %r" % e)
+                authenticated = False
+            if authenticated:
+                # fresh session - its age counts from now (even when eLan kept the cookie)
+                self._auth_cookie()
+                self._cookie_issued = loop.time()
+                self.generation += 1
+                self.logins += 1
+                self.last_duration = loop.time() - started
+                self.total_duration += self.last_duration
+                logger.info("Logged in to eLan in %.2f s" % self.last_duration)
+                return
+            self.failures += 1
+        raise Exception('Login to eLan failed!')
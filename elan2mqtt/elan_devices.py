@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+##########################################################################
+#
+# eLan device enumeration shared by main_worker and socket_listener
+#
+# Device info is fetched in parallel (with limited number of requests
+# running at once) and each device is handed over to the caller
+# as soon as its info is known.
+#
+##########################################################################
+
+import asyncio
+import logging
+
+import json_codec
+
+logger = logging.getLogger(__name__)
+
+
+def device_mac(device_list, device):
+    """Return MAC (address) of device. Device id is used when there is no MAC."""
+    info = device_list[device]['info']
+    if "address" in info['device info']:
+        return str(info['device info']['address'])
+    mac = str(info['id'])
+    logger.error("There is no MAC for device " + str(device_list[device]))
+    info['device info']['address'] = mac
+    return mac
+
+
+async def enumerate_devices(session, device_list, on_ready, concurrency=8):
+    """Fetch info of all devices from device_list (response of /api/devices).
+
+    Info is stored to device_list[device]['info'] and coroutine
+    on_ready(device, mac) is awaited for each device as soon as the info is
+    available. At most concurrency devices are processed at once.
+    """
+    loop = asyncio.get_event_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    started = loop.time()
+    first_ready = []
+
+    async def setup(device):
+        async with semaphore:
+            resp = await session.get(device_list[device]['url'], timeout=3)
+            device_list[device]['info'] = await resp.json(loads=json_codec.loads)
+            mac = device_mac(device_list, device)
+            logger.info("Setting up " + device_list[device]['url'])
+            await on_ready(device, mac)
+            if not first_ready:
+                first_ready.append(loop.time() - started)
+
+    results = await asyncio.gather(*[setup(device) for device in device_list], return_exceptions=True)
+    failed = [result for result in results if isinstance(result, BaseException)]
+
+    logger.info("Startup: %d devices set up in %.2f s (first device ready in %.2f s, concurrency %d, %d failed)"
+                % (len(device_list) - len(failed), loop.time() - started,
+                   first_ready[0] if first_ready else 0, concurrency, len(failed)))
+    if failed:
+        # any failure triggers restart of the whole gateway
+        raise failed[0]
@@ -0,0 +1,456 @@
+# -*- coding: utf-8 -*-
+
+##########################################################################
+#
+# Local eLan simulator (for offline testing and benchmarking)
+#
+# Simulates eLan RF box with N devices built from profiles of real
+# devices (see device info library in discovery.py):
+# - /, /api, /login (SHA1 key check, AuthID cookie)
+# - /api/devices, device info, /state and PUT of device
+# - /api/ws websocket with state change announcements
+#
+# Faults can be injected (and changed while running) to load-test and
+# fault-test the gateway: latency, slow responses, server errors,
+# spurious 401s, session expiry and dropped connections.
+#
+# Usage:
+#   python elan_simulator.py -devices 100 -port 8080 -latency 0.02
+#   python main_worker.py http://127.0.0.1:8080 mqtt://... -elan-password elan
+#
+# or from tests / benchmarks:
+#   simulator = ElanSimulator(devices=100)
+#   await simulator.start()
+#   ... simulator.url ...
+#   await simulator.stop()
+#
+##########################################################################
+
+import argparse
+import asyncio
+import copy
+import hashlib
+import itertools
+import logging
+import random
+import secrets
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import json_codec
+
+logger = logging.getLogger(__name__)
+
+
+def _relay_actions(delayed=True):
+    actions = {'on': {'type': 'bool'}}
+    if delayed:
+        actions.update({
+            'delayed off': {'type': None},
+            'delayed on': {'type': None},
+            'delayed off: set time': {'type': 'int', 'min': 2, 'max': 3600, 'step': 1},
+            'delayed on: set time': {'type': 'int', 'min': 2, 'max': 3600, 'step': 1},
+        })
+    actions['automat'] = {'type': 'bool'}
+    return actions
+
+
+# product type -> device info template and initial state
+PROFILES = {
+    'RFSA-66M': {
+        'type': 'irrigation',
+        'actions info': _relay_actions(),
+        'primary actions': ['on'],
+        'secondary actions': [['delayed off', 'delayed off: set time'],
+                              ['delayed on', 'delayed on: set time'], 'automat'],
+        'settings': {'delayed off: set time': 1800, 'delayed on: set time': 0},
+        'state': {'on': False, 'delay': False, 'automat': False, 'locked': False,
+                  'delayed off: set time': 1800, 'delayed on: set time': 0},
+    },
+    'RFSA-11B': {
+        'type': 'appliance',
+        'actions info': _relay_actions(delayed=False),
+        'primary actions': ['on'],
+        'secondary actions': ['automat'],
+        'settings': {},
+        'state': {'on': False, 'automat': True, 'locked': False},
+    },
+    'RFUS-61': {
+        'type': 'appliance',
+        'actions info': _relay_actions(),
+        'primary actions': ['on'],
+        'secondary actions': [['delayed off', 'delayed off: set time'],
+                              ['delayed on', 'delayed on: set time'], 'automat'],
+        'settings': {'delayed off: set time': 2400, 'delayed on: set time': 2},
+        'state': {'on': False, 'delay': False, 'automat': False, 'locked': False,
+                  'delayed off: set time': 2400, 'delayed on: set time': 2},
+    },
+    'RFDA-11B': {
+        'type': 'dimmed light',
+        'actions info': {
+            'brightness': {'type': 'int', 'min': 0, 'max': 100, 'step': 5},
+            'increase': {'type': None},
+            'decrease': {'type': None},
+            'automat': {'type': 'bool'},
+        },
+        'primary actions': ['brightness'],
+        'secondary actions': [['increase', 'decrease'], 'automat'],
+        'settings': {},
+        'state': {'brightness': 0, 'automat': False, 'locked': False},
+    },
+    'RFSTI-11G': {
+        'type': 'heating',
+        'actions info': {'on': {'type': 'bool'}},
+        'primary actions': ['on'],
+        'secondary actions': [],
+        'settings': {},
+        'state': {'temperature IN': 21.5, 'temperature OUT': 20.0, 'on': False},
+    },
+    'RFTI-10B': {
+        'type': 'thermometer',
+        'actions info': {},
+        'primary actions': [],
+        'secondary actions': [],
+        'settings': {},
+        'state': {'temperature IN': 21.0, 'temperature OUT': 4.5},
+    },
+    'RFWD-100': {
+        'type': 'window detector',
+        'actions info': {
+            'automat': {'type': 'bool'},
+            'deactivate': {'type': None},
+            'disarm': {'type': 'bool'},
+        },
+        'primary actions': ['deactivate', 'disarm'],
+        'secondary actions': ['automat'],
+        'settings': {'disarm': False},
+        'state': {'alarm': False, 'detect': False, 'tamper': 'closed', 'automat': False,
+                  'battery': True, 'disarm': False},
+    },
+    'RFSF-1B': {
+        'type': 'flood detector',
+        'actions info': {
+            'automat': {'type': 'bool'},
+            'deactivate': {'type': None},
+            'disarm': {'type': 'bool'},
+        },
+        'primary actions': ['deactivate', 'disarm'],
+        'secondary actions': ['automat'],
+        'settings': {'disarm': False},
+        'state': {'alarm': False, 'detect': False, 'automat': True, 'battery': True, 'disarm': False},
+    },
+}
+
+
+class Faults:
+    """Faults injected by simulator (attributes can be changed while running)
+
+    latency         - delay of every response in s (+ up to jitter s)
+    slow_rate       - probability that response is delayed by slow_delay s
+    error_rate      - probability of 500 Internal Server Error
+    unauthorized_rate - probability of 401 even with valid session
+    drop_rate       - probability that connection is dropped without response
+    session_lifetime - AuthID is valid for s after login (0 = forever)
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, slow_rate=0.0, slow_delay=5.0, error_rate=0.0,
+                 unauthorized_rate=0.0, drop_rate=0.0, session_lifetime=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.slow_rate = slow_rate
+        self.slow_delay = slow_delay
+        self.error_rate = error_rate
+        self.unauthorized_rate = unauthorized_rate
+        self.drop_rate = drop_rate
+        self.session_lifetime = session_lifetime
+
+
+class ElanSimulator:
+    """eLan with devices simulated from PROFILES.
+
+    devices - number of devices, products - product types to cycle through
+    (all PROFILES by default). password None simulates old firmware without
+    authentication.
+    """
+
+    def __init__(self, devices=10, products=None, user='admin', password='elan', faults=None, seed=None):
+        self.faults = faults if faults is not None else Faults()
+        self._random = random.Random(seed)
+        self._user = user
+        self._key = hashlib.sha1(password.encode('cp1250')).hexdigest() if password is not None else None
+        # AuthID -> time of login
+        self._sessions = {}
+        self._websockets = set()
+        self._server = None
+        # http://host:port of running simulator
+        self.url = None
+        self.devices = {}
+        self.states = {}
+        cycle = itertools.cycle(products or list(PROFILES))
+        for n in range(devices):
+            self.add_device(next(cycle))
+        self.requests = dict.fromkeys(('login', 'devices', 'info', 'state', 'put', 'ws'), 0)
+        self.faults_injected = dict.fromkeys(('slow', 'error', 'unauthorized', 'expired', 'drop'), 0)
+        self.events = 0
+
+    def add_device(self, product, label=None):
+        """Add device of product type, return its id"""
+        profile = PROFILES[product]
+        n = len(self.devices)
+        id = str(10000 + n)
+        info = {key: copy.deepcopy(value) for key, value in profile.items() if key not in ('type', 'state')}
+        info['device info'] = {'address': 100000 + n, 'label': label or '%s %d' % (product, n),
+                               'type': profile['type'], 'product type': product}
+        info['id'] = id
+        self.devices[id] = info
+        self.states[id] = copy.deepcopy(profile['state'])
+        return id
+
+    def add_device_info(self, info, state):
+        """Add device with info (as returned by eLan) and state, return its id"""
+        id = str(info['id'])
+        self.devices[id] = info
+        self.states[id] = state
+        return id
+
+    def app(self):
+        app = web.Application(middlewares=[self._faults_middleware])
+        app.router.add_get('/', self._index)
+        app.router.add_get('/api', self._api)
+        app.router.add_post('/login', self._login)
+        app.router.add_get('/api/devices', self._device_list)
+        app.router.add_get('/api/ws', self._websocket)
+        app.router.add_get('/api/devices/{id}', self._device_info)
+        app.router.add_put('/api/devices/{id}', self._put)
+        app.router.add_get('/api/devices/{id}/state', self._state)
+        return app
+
+    async def start(self, host='127.0.0.1', port=None):
+        """Start serving, return aiohttp.test_utils.TestServer (server.make_url('/'))"""
+        self._server = TestServer(self.app(), host=host, port=port)
+        await self._server.start_server()
+        self.url = str(self._server.make_url('')).rstrip('/')
+        logger.info("eLan simulator with %d devices at %s" % (len(self.devices), self.url))
+        return self._server
+
+    async def stop(self):
+        for websocket in list(self._websockets):
+            await websocket.close()
+        if self._server is not None:
+            await self._server.close()
+            self._server = None
+
+    def expire_sessions(self):
+        """All sessions expire (next requests get 401)"""
+        self._sessions.clear()
+
+    async def drop_websockets(self):
+        """Close all websocket connections (as eLan restart does)"""
+        for websocket in list(self._websockets):
+            await websocket.close()
+
+    async def change(self, id, **values):
+        """Change state of device (e.g. wall switch pressed) and announce it"""
+        self.states[id].update(values)
+        await self.announce(id)
+
+    async def announce(self, id, message=None):
+        """Announce state change of device to websocket clients (message e.g. recorded frame)"""
+        self.events += 1
+        if message is None:
+            message = json_codec.dumps({'device': id})
+        for websocket in list(self._websockets):
+            try:
+                await websocket.send_str(message)
+            except ConnectionError:
+                self._websockets.discard(websocket)
+
+    async def random_events(self, rate):
+        """Change state of random devices, rate changes per s (forever)"""
+        ids = list(self.devices)
+        while True:
+            await asyncio.sleep(self._random.expovariate(rate))
+            id = self._random.choice(ids)
+            state = self.states[id]
+            if 'on' in state:
+                state['on'] = not state['on']
+            elif 'brightness' in state:
+                state['brightness'] = self._random.randrange(0, 101, 5)
+            elif 'detect' in state:
+                state['detect'] = not state['detect']
+            elif 'temperature IN' in state:
+                state['temperature IN'] = round(state['temperature IN'] + self._random.uniform(-0.5, 0.5), 1)
+            await self.announce(id)
+
+    def stats(self):
+        return {'requests': dict(self.requests), 'faults': dict(self.faults_injected), 'events': self.events,
+                'websockets': len(self._websockets)}
+
+    def _authenticated(self, request):
+        if self._key is None:
+            return True
+        issued = self._sessions.get(request.cookies.get('AuthID'))
+        if issued is None:
+            return False
+        lifetime = self.faults.session_lifetime
+        if lifetime and asyncio.get_event_loop().time() - issued > lifetime:
+            self.faults_injected['expired'] += 1
+            del self._sessions[request.cookies['AuthID']]
+            return False
+        return True
+
+    @web.middleware
+    async def _faults_middleware(self, request, handler):
+        faults = self.faults
+        delay = faults.latency + self._random.uniform(0, faults.jitter)
+        if faults.slow_rate and self._random.random() < faults.slow_rate:
+            self.faults_injected['slow'] += 1
+            delay += faults.slow_delay
+        if delay:
+            await asyncio.sleep(delay)
+        if request.path in ('/', '/login'):
+            return await handler(request)
+        if faults.drop_rate and self._random.random() < faults.drop_rate:
+            self.faults_injected['drop'] += 1
+            request.transport.close()
+            # response is never delivered, client sees disconnected server
+            raise asyncio.CancelledError()
+        if faults.error_rate and self._random.random() < faults.error_rate:
+            self.faults_injected['error'] += 1
+            raise web.HTTPInternalServerError()
+        if not self._authenticated(request):
+            raise web.HTTPUnauthorized()
+        if faults.unauthorized_rate and self._random.random() < faults.unauthorized_rate:
+            self.faults_injected['unauthorized'] += 1
+            raise web.HTTPUnauthorized()
+        return await handler(request)
+
+    async def _index(self, request):
+        return web.Response(text='<html><body>eLan simulator</body></html>', content_type='text/html')
+
+    async def _api(self, request):
+        return web.json_response({'devices': {'href': '%s://%s/api/devices' % (request.scheme, request.host)}},
+                                 dumps=json_codec.dumps)
+
+    async def _login(self, request):
+        self.requests['login'] += 1
+        form = await request.post()
+        if self._key is not None and (form.get('name') != self._user or form.get('key') != self._key):
+            raise web.HTTPUnauthorized()
+        token = secrets.token_hex(16)
+        self._sessions[token] = asyncio.get_event_loop().time()
+        response = web.Response(text='OK')
+        response.set_cookie('AuthID', token, path='/')
+        return response
+
+    async def _device_list(self, request):
+        self.requests['devices'] += 1
+        base = '%s://%s/api/devices/' % (request.scheme, request.host)
+        return web.json_response({id: {'url': base + id} for id in self.devices}, dumps=json_codec.dumps)
+
+    def _device(self, request):
+        id = request.match_info['id']
+        if id not in self.devices:
+            raise web.HTTPNotFound()
+        return id
+
+    async def _device_info(self, request):
+        self.requests['info'] += 1
+        return web.json_response(self.devices[self._device(request)], dumps=json_codec.dumps)
+
+    async def _state(self, request):
+        self.requests['state'] += 1
+        return web.json_response(self.states[self._device(request)], dumps=json_codec.dumps)
+
+    async def _put(self, request):
+        self.requests['put'] += 1
+        id = self._device(request)
+        try:
+            command = json_codec.loads(await request.read())
+        except ValueError:
+            raise web.HTTPBadRequest()
+        actions = self.devices[id]['actions info']
+        state = self.states[id]
+        for action, value in command.items():
+            if action not in actions:
+                raise web.HTTPBadRequest(text='Unknown action ' + action)
+            if action in state:
+                state[action] = value
+        asyncio.ensure_future(self.announce(id))
+        return web.Response()
+
+    async def _websocket(self, request):
+        self.requests['ws'] += 1
+        websocket = web.WebSocketResponse()
+        await websocket.prepare(request)
+        self._websockets.add(websocket)
+        try:
+            async for msg in websocket:
+                pass
+        finally:
+            self._websockets.discard(websocket)
+        return websocket
+
+
+async def main():
+    faults = Faults(latency=args.latency, jitter=args.jitter, slow_rate=args.slow_rate, error_rate=args.error_rate,
+                    unauthorized_rate=args.unauthorized_rate, drop_rate=args.drop_rate,
+                    session_lifetime=args.session_lifetime)
+    products = args.products.split(',') if args.products else None
+    simulator = ElanSimulator(args.devices, products, args.user, args.password or None, faults, args.seed)
+    await simulator.start(args.host, args.port)
+    events = None
+    if args.event_rate > 0:
+        events = asyncio.ensure_future(simulator.random_events(args.event_rate))
+    try:
+        while True:
+            await asyncio.sleep(60)
+            logger.info("eLan simulator: " + str(simulator.stats()))
+    finally:
+        if events is not None:
+            events.cancel()
+        await simulator.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Simulate eLan RF box with devices.')
+    parser.add_argument('-host', metavar='host', dest='host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('-port', metavar='port', dest='port', type=int, default=8080, help='port to listen on')
+    parser.add_argument('-devices', metavar='devices', dest='devices', type=int, default=10,
+                        help='number of simulated devices')
+    parser.add_argument('-products', metavar='products', dest='products', default='',
+                        help='product types of devices, e.g. "RFSA-66M,RFDA-11B" (default all known: '
+                        + ','.join(PROFILES) + ')')
+    parser.add_argument('-user', metavar='user', dest='user', default='admin', help='eLan user')
+    parser.add_argument('-password', metavar='password', dest='password', default='elan',
+                        help='eLan password (empty = no authentication as old firmwares)')
+    parser.add_argument('-event-rate', metavar='event_rate', dest='event_rate', type=float, default=0,
+                        help='random state changes per s (0 = none)')
+    parser.add_argument('-latency', metavar='latency', dest='latency', type=float, default=0,
+                        help='delay of every response in s')
+    parser.add_argument('-jitter', metavar='jitter', dest='jitter', type=float, default=0,
+                        help='random extra delay of responses up to s')
+    parser.add_argument('-slow-rate', metavar='slow_rate', dest='slow_rate', type=float, default=0,
+                        help='probability of slow (5 s) response')
+    parser.add_argument('-error-rate', metavar='error_rate', dest='error_rate', type=float, default=0,
+                        help='probability of 500 response')
+    parser.add_argument('-unauthorized-rate', metavar='unauthorized_rate', dest='unauthorized_rate', type=float,
+                        default=0, help='probability of 401 response with valid session')
+    parser.add_argument('-drop-rate', metavar='drop_rate', dest='drop_rate', type=float, default=0,
+                        help='probability of dropped connection')
+    parser.add_argument('-session-lifetime', metavar='session_lifetime', dest='session_lifetime', type=float,
+                        default=0, help='session expires after s (0 = never)')
+    parser.add_argument('-seed', metavar='seed', dest='seed', type=int, default=None, help='random seed')
+    parser.add_argument('-log-level', metavar='log_level', dest='log_level', default='info', help='log level')
+    args = parser.parse_args()
+
+    formatter = "[%(asctime)s] {%(filename)s:%(lineno)d} %(levelname)s - %(message)s"
+    numeric_level = getattr(logging, args.log_level.upper(), None)
+    if not isinstance(numeric_level, int):
+        numeric_level = 30
+    logging.basicConfig(level=numeric_level, format=formatter)
+    try:
+        asyncio.get_event_loop().run_until_complete(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+##########################################################################
+#
+# JSON codec used by the gateway
+#
+# The fastest installed library is used: orjson, ujson or stdlib json.
+# Environment variable ELAN2MQTT_JSON (orjson|ujson|json) forces one.
+#
+# - loads(data) accepts str, bytes or bytearray
+# - dumps(obj) returns str (aiohttp json_serialize)
+# - dumpb(obj) returns bytes (MQTT payloads)
+# - canonical(obj) returns bytes with sorted keys (change detection)
+#
+##########################################################################
+
+import json
+import os
+
+
+class Codec:
+    def __init__(self, name, loads, dumps, dumpb, canonical):
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+        self.dumpb = dumpb
+        self.canonical = canonical
+
+
+def _stdlib():
+    return Codec(
+        'json',
+        json.loads,
+        json.dumps,
+        lambda obj, compact=False: json.dumps(
+            obj, separators=(',', ':') if compact else None).encode('utf-8'),
+        lambda obj: json.dumps(obj, sort_keys=True, separators=(',', ':')).encode('utf-8'))
+
+
+def _orjson():
+    import orjson
+    # orjson output is always compact (and UTF-8)
+    return Codec(
+        'orjson',
+        orjson.loads,
+        lambda obj: orjson.dumps(obj).decode('utf-8'),
+        lambda obj, compact=False: orjson.dumps(obj),
+        lambda obj: orjson.dumps(obj, option=orjson.OPT_SORT_KEYS))
+
+
+def _ujson():
+    import ujson
+    return Codec(
+        'ujson',
+        ujson.loads,
+        lambda obj: ujson.dumps(obj, ensure_ascii=False),
+        lambda obj, compact=False: ujson.dumps(obj, ensure_ascii=False).encode('utf-8'),
+        lambda obj: ujson.dumps(obj, ensure_ascii=False, sort_keys=True).encode('utf-8'))
+
+
+# in order of preference
+CODECS = {'orjson': _orjson, 'ujson': _ujson, 'json': _stdlib}
+
+
+def available():
+    """Return list of codecs which can be used here"""
+    codecs = []
+    for factory in CODECS.values():
+        try:
+            codecs.append(factory())
+        except ImportError:
+            pass
+    return codecs
+
+
+def select(name=None):
+    """Return codec by name, or the fastest installed one"""
+    if name:
+        return CODECS[name]()
+    return available()[0]
+
+
+_active = select(os.environ.get('ELAN2MQTT_JSON'))
+
+NAME = _active.name
+loads = _active.loads
+dumps = _active.dumps
+dumpb = _active.dumpb
+canonical = _active.canonical
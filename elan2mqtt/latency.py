@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+##########################################################################
+#
+# Per-stage latency of message pipelines
+#
+# Message (command or state change) of device is stamped when it enters
+# the pipeline and when it passes every stage. Time between stages and
+# end-to-end time go to histograms (see metrics.py), p50/p95/p99 are
+# reported in logs.
+#
+# Bookkeeping does not allocate per message: every device has its slot
+# (start and last stamp) allocated once. One message per device is
+# tracked at a time - that is what the pipelines process anyway
+# (commands of device are merged, status fetches are single-flight).
+#
+##########################################################################
+
+import asyncio
+
+from metrics import PERCENTILE_BUCKETS
+
+# command: MQTT message -> command queue -> device worker -> PUT -> GET /state -> MQTT publish
+COMMAND_STAGES = ('received', 'dequeued', 'dispatched', 'put', 'state', 'published')
+# event: websocket frame -> parsed -> GET /state -> MQTT publish
+EVENT_STAGES = ('frame', 'parsed', 'state', 'published')
+
+
+class Pipeline:
+    """Latency of pipeline with given stages (stage 0 is the start)"""
+
+    def __init__(self, registry, name, stages):
+        self.name = name
+        self._stages = stages
+        self._loop = asyncio.get_event_loop()
+        self._slots = {}
+        help = 'Latency of ' + name + ' pipeline stages'
+        # time from previous stage, by stage
+        self._histograms = {stage: registry.histogram('pipeline_stage_seconds', help, buckets=PERCENTILE_BUCKETS,
+                                                      pipeline=name, stage=stage)
+                            for stage in stages[1:]}
+        self._total = registry.histogram('pipeline_seconds', 'End-to-end latency of pipelines',
+                                         buckets=PERCENTILE_BUCKETS, pipeline=name)
+
+    def start(self, key, timestamp=None):
+        """Message for key entered the pipeline (unless one is in flight already).
+
+        Returns False when the message is not tracked (its stages must not be stamped).
+        """
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = [0.0, 0.0]
+        if slot[0] != 0.0:
+            return False
+        slot[0] = slot[1] = timestamp or self._loop.time()
+        return True
+
+    def stage(self, key, stage, timestamp=None):
+        """Message for key passed stage (no-op when no message is in flight)"""
+        slot = self._slots.get(key)
+        if slot is not None and slot[0] != 0.0:
+            now = max(timestamp or self._loop.time(), slot[1])
+            self._histograms[stage].observe(now - slot[1])
+            slot[1] = now
+
+    def end(self, key):
+        """Message for key passed the last stage"""
+        slot = self._slots.get(key)
+        if slot is not None and slot[0] != 0.0:
+            self.stage(key, self._stages[-1])
+            self._total.observe(slot[1] - slot[0])
+            slot[0] = 0.0
+
+    def abort(self, key):
+        """Message for key was dropped (e.g. failed)"""
+        slot = self._slots.get(key)
+        if slot is not None:
+            slot[0] = 0.0
+
+    def forget(self, key):
+        self._slots.pop(key, None)
+
+    def summary(self):
+        def percentiles(histogram):
+            return '%d: %.3f/%.3f/%.3f' % (histogram.count, histogram.percentile(0.5),
+                                           histogram.percentile(0.95), histogram.percentile(0.99))
+        parts = ['%s %s' % (stage, percentiles(histogram)) for stage, histogram in self._histograms.items()]
+        return (self.name + ' latency p50/p95/p99 s - total ' + percentiles(self._total)
+                + ', ' + ', '.join(parts))
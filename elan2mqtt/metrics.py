@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+
+##########################################################################
+#
+# Metrics in Prometheus text format
+#
+# - counters and histograms are preallocated, update is just adding to
+#   attribute / list item (no allocation on hot path)
+# - values the gateway already counts (state cache, logins, ...) are
+#   registered as callbacks and read only when metrics are scraped
+# - MetricsServer serves them at /metrics (vendored aiohttp.web, imported
+#   only when the server is started - aiohttp submodules load lazily)
+#
+##########################################################################
+
+import asyncio
+import bisect
+import logging
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+# 1 ms .. ~60 s, each bucket 25 % wider (percentiles are precise to 25 %)
+PERCENTILE_BUCKETS = tuple(round(0.001 * 1.25 ** i, 6) for i in range(50))
+
+
+def _labels(labels, extra=None):
+    items = list(labels.items())
+    if extra is not None:
+        items.append(extra)
+    if not items:
+        return ''
+    return '{' + ','.join('%s="%s"' % (key, value) for key, value in items) + '}'
+
+
+class Counter:
+    def __init__(self, labels):
+        self.labels = labels
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self, name):
+        yield name + _labels(self.labels), self.value
+
+
+class Gauge(Counter):
+    def set(self, value):
+        self.value = value
+
+
+class Callback:
+    """Counter or gauge which value is read by fn() when scraped"""
+
+    def __init__(self, labels, fn):
+        self.labels = labels
+        self._fn = fn
+
+    def samples(self, name):
+        yield name + _labels(self.labels), self._fn()
+
+
+class Histogram:
+    def __init__(self, labels, buckets):
+        self.labels = labels
+        self._buckets = tuple(buckets)
+        # last item counts observations above the highest bucket
+        self._counts = [0] * (len(self._buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self._counts[bisect.bisect_left(self._buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def percentile(self, q):
+        """Estimate q-th (0..1) percentile (upper bound of its bucket)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self._buckets, self._counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float('inf')
+
+    def samples(self, name):
+        cumulative = 0
+        for bound, count in zip(self._buckets, self._counts):
+            cumulative += count
+            yield name + '_bucket' + _labels(self.labels, ('le', repr(bound))), cumulative
+        yield name + '_bucket' + _labels(self.labels, ('le', '+Inf')), self.count
+        yield name + '_sum' + _labels(self.labels), self.sum
+        yield name + '_count' + _labels(self.labels), self.count
+
+
+class MetricsRegistry:
+    """Metric families by name. Metric with the same name and labels is
+    returned again when registered again (e.g. after worker restart)."""
+
+    def __init__(self, prefix='elan2mqtt_'):
+        self._prefix = prefix
+        self._families = {}
+
+    def _get(self, metric_type, name, help, labels, factory):
+        family = self._families.setdefault(self._prefix + name, (metric_type, help, {}))
+        key = tuple(sorted(labels.items()))
+        metric = family[2].get(key)
+        if metric is None or isinstance(metric, Callback):
+            metric = factory()
+            family[2][key] = metric
+        return metric
+
+    def counter(self, name, help, **labels):
+        return self._get('counter', name, help, labels, lambda: Counter(labels))
+
+    def gauge(self, name, help, **labels):
+        return self._get('gauge', name, help, labels, lambda: Gauge(labels))
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS, **labels):
+        return self._get('histogram', name, help, labels, lambda: Histogram(labels, buckets))
+
+    def callback(self, metric_type, name, help, fn, **labels):
+        """Register counter/gauge read by fn (replaces previous one)"""
+        return self._get(metric_type, name, help, labels, lambda: Callback(labels, fn))
+
+    def render(self):
+        lines = []
+        for name, (metric_type, help, metrics) in self._families.items():
+            lines.append('# HELP %s %s' % (name, help))
+            lines.append("# TYPE %s %s" % (name, metric_type))
+            for metric in metrics.values():
+                try:
+                    for sample, value in metric.samples(name):
+                        lines.append('%s %s' % (sample, value))
+                except Exception:
+                    logger.exception("Metric " + name + " failed")
+        lines.append('')
+        return '\n'.join(lines)
+
+
+async def monitor_loop_lag(histogram, gauge, interval=1.0):
+    """Measure how late the event loop wakes up sleeping task"""
+    loop = asyncio.get_event_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - expected)
+        histogram.observe(lag)
+        gauge.set(lag)
+
+
+class MetricsServer:
+    """HTTP server with /metrics endpoint"""
+
+    def __init__(self, registry, host='0.0.0.0', port=9100):
+        self._registry = registry
+        self._host = host
+        self._port = port
+        self._runner = None
+
+    async def _metrics(self, request):
+        from aiohttp import web
+        return web.Response(text=self._registry.render(),
+                            content_type='text/plain', charset='utf-8',
+                            headers={'X-Content-Type-Options': 'nosniff'})
+
+    async def start(self):
+        from aiohttp import web
+        app = web.Application()
+        app.router.add_get('/metrics', self._metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self._host, self._port, reuse_address=True)
+        await site.start()
+        logger.info("Metrics available at http://%s:%d/metrics" % (self._host, self._port))
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
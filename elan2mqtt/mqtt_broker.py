@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+
+##########################################################################
+#
+# In-process MQTT 3.1.1 broker stand-in (for tests and benchmarks)
+#
+# Just enough of MQTT for the gateway and its tests:
+# - CONNECT, SUBSCRIBE / UNSUBSCRIBE with + and # wildcards, PINGREQ,
+#   DISCONNECT
+# - PUBLISH with QoS 0 and 1 (delivered with the lower of message and
+#   subscription QoS, acknowledgements of QoS 1 deliveries are not
+#   awaited), retained messages
+# No persistence, authentication, will messages or QoS 2.
+#
+# Every message (published by clients or injected by publish()) is
+# counted per topic: messages, bytes and timestamps (time.monotonic,
+# the same clock as paho message.timestamp), so benchmark and soak runs
+# can count exactly what the gateway publishes. on_publish callback is
+# called for every message published by clients.
+#
+##########################################################################
+
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+CONNECT, CONNACK, PUBLISH, PUBACK = 1, 2, 3, 4
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK = 8, 9, 10, 11
+PINGREQ, PINGRESP, DISCONNECT = 12, 13, 14
+
+
+def _remaining_length(length):
+    encoded = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        if length:
+            byte |= 0x80
+        encoded.append(byte)
+        if not length:
+            return bytes(encoded)
+
+
+def _packet(packet_type, body, flags=0):
+    return bytes((packet_type << 4 | flags,)) + _remaining_length(len(body)) + body
+
+
+def _string(data, offset):
+    """Return (bytes, new offset) of length prefixed string"""
+    length = int.from_bytes(data[offset:offset + 2], 'big')
+    return data[offset + 2:offset + 2 + length], offset + 2 + length
+
+
+def topic_matches(topic_filter, topic):
+    """Does topic match subscription filter (with + and # wildcards)?"""
+    if topic_filter == topic:
+        return True
+    if topic.startswith('$') and topic_filter[:1] in ('+', '#'):
+        # wildcards at the first level do not match $SYS and similar topics
+        return False
+    levels = topic.split('/')
+    filter_levels = topic_filter.split('/')
+    for i, level in enumerate(filter_levels):
+        if level == '#':
+            return True
+        if i >= len(levels) or (level != '+' and level != levels[i]):
+            return False
+    return len(filter_levels) == len(levels)
+
+
+class TopicStats:
+    """Messages published to topic"""
+
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+        self.timestamps = []
+
+    def record(self, payload, timestamp):
+        self.messages += 1
+        self.bytes += len(payload)
+        self.timestamps.append(timestamp)
+
+    def stats(self):
+        return {'messages': self.messages, 'bytes': self.bytes,
+                'first': self.timestamps[0] if self.timestamps else None,
+                'last': self.timestamps[-1] if self.timestamps else None}
+
+
+class _Client:
+    def __init__(self, writer):
+        self.writer = writer
+        self.client_id = ''
+        # topic filter -> QoS
+        self.subscriptions = {}
+        self._packet_id = 0
+
+    def next_packet_id(self):
+        self._packet_id = self._packet_id % 65535 + 1
+        return self._packet_id
+
+    def qos(self, topic):
+        """Highest QoS of subscriptions matching topic (None = not subscribed)"""
+        qos = None
+        for topic_filter, filter_qos in self.subscriptions.items():
+            if topic_matches(topic_filter, topic) and (qos is None or filter_qos > qos):
+                qos = filter_qos
+        return qos
+
+    def send(self, topic, payload, qos, retain=False):
+        encoded_topic = topic.encode('utf-8')
+        body = len(encoded_topic).to_bytes(2, 'big') + encoded_topic
+        if qos:
+            body += self.next_packet_id().to_bytes(2, 'big')
+        self.writer.write(_packet(PUBLISH, body + payload, qos << 1 | int(retain)))
+
+
+class MqttBroker:
+    """MQTT broker serving clients of this process' event loop.
+
+    on_publish(topic, payload) is called for every message published by
+    clients (topic is str, payload bytes).
+    """
+
+    def __init__(self, on_publish=None):
+        self.on_publish = on_publish
+        self._server = None
+        self._clients = set()
+        # topic -> (payload, QoS)
+        self.retained = {}
+        # topic -> TopicStats
+        self.topics = {}
+        # (topic filter, count, future) of wait_for() calls
+        self._waiters = []
+        self.port = None
+        self.received = 0
+        self.delivered = 0
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Start listening, return port (random free one by default)"""
+        self._server = await asyncio.start_server(self._serve, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("MQTT broker stand-in at %s:%d" % (host, self.port))
+        return self.port
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            for client in list(self._clients):
+                client.writer.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        """Publish message as if other client published it"""
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        self._route(topic, payload, qos, retain)
+
+    def count(self, topic_filter='#'):
+        """Number of messages published to topics matching filter"""
+        return sum(stats.messages for topic, stats in self.topics.items() if topic_matches(topic_filter, topic))
+
+    async def wait_for(self, topic_filter='#', count=1, timeout=10):
+        """Wait until count messages were published to topics matching filter"""
+        if self.count(topic_filter) >= count:
+            return
+        future = asyncio.get_event_loop().create_future()
+        waiter = (topic_filter, count, future)
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(future, timeout)
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def stats(self):
+        return {'clients': len(self._clients), 'received': self.received, 'delivered': self.delivered,
+                'retained': len(self.retained), 'topics': len(self.topics)}
+
+    def _route(self, topic, payload, qos, retain):
+        stats = self.topics.get(topic)
+        if stats is None:
+            stats = self.topics[topic] = TopicStats()
+        stats.record(payload, time.monotonic())
+        if retain:
+            if payload:
+                self.retained[topic] = (payload, qos)
+            else:
+                # empty retained message removes retained message of topic
+                self.retained.pop(topic, None)
+        for client in self._clients:
+            subscription_qos = client.qos(topic)
+            if subscription_qos is not None:
+                client.send(topic, payload, min(qos, subscription_qos))
+                self.delivered += 1
+        for waiter in list(self._waiters):
+            topic_filter, count, future = waiter
+            if not future.done() and topic_matches(topic_filter, topic) and self.count(topic_filter) >= count:
+                future.set_result(None)
+
+    async def _serve(self, reader, writer):
+        client = _Client(writer)
+        self._clients.add(client)
+        try:
+            while True:
+                header = (await reader.readexactly(1))[0]
+                length, multiplier = 0, 1
+                while True:
+                    byte = (await reader.readexactly(1))[0]
+                    length += (byte & 0x7f) * multiplier
+                    if not byte & 0x80:
+                        break
+                    multiplier *= 128
+                body = await reader.readexactly(length)
+                if not self._handle(client, header >> 4, header & 0x0f, body):
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._clients.discard(client)
+            writer.close()
+
+    def _handle(self, client, packet_type, flags, body):
+        """Process packet, return False when connection should be closed"""
+        writer = client.writer
+        if packet_type == PUBLISH:
+            qos = (flags >> 1) & 0x03
+            topic, offset = _string(body, 0)
+            if qos > 1:
+                logger.warning("QoS %d is not supported, disconnecting %s" % (qos, client.client_id))
+                return False
+            if qos:
+                writer.write(_packet(PUBACK, body[offset:offset + 2]))
+                offset += 2
+            self.received += 1
+            topic = topic.decode('utf-8')
+            payload = body[offset:]
+            if self.on_publish is not None:
+                self.on_publish(topic, payload)
+            self._route(topic, payload, qos, bool(flags & 0x01))
+        elif packet_type == CONNECT:
+            # protocol name, level, flags, keep alive - then client id
+            protocol, offset = _string(body, 0)
+            client.client_id = _string(body, offset + 4)[0].decode('utf-8')
+            for other in list(self._clients):
+                if other is not client and client.client_id and other.client_id == client.client_id:
+                    # the same client connected again, old connection is closed
+                    other.writer.close()
+                    self._clients.discard(other)
+            writer.write(_packet(CONNACK, b'\x00\x00'))
+        elif packet_type == SUBSCRIBE:
+            packet_id, offset, granted, topic_filters = body[:2], 2, bytearray(), []
+            while offset < len(body):
+                topic_filter, offset = _string(body, offset)
+                qos = min(body[offset], 1)
+                offset += 1
+                topic_filter = topic_filter.decode('utf-8')
+                client.subscriptions[topic_filter] = qos
+                topic_filters.append(topic_filter)
+                granted.append(qos)
+            writer.write(_packet(SUBACK, packet_id + bytes(granted)))
+            for topic, (payload, qos) in self.retained.items():
+                if any(topic_matches(topic_filter, topic) for topic_filter in topic_filters):
+                    client.send(topic, payload, min(qos, client.qos(topic)), retain=True)
+                    self.delivered += 1
+        elif packet_type == UNSUBSCRIBE:
+            packet_id, offset = body[:2], 2
+            while offset < len(body):
+                topic_filter, offset = _string(body, offset)
+                client.subscriptions.pop(topic_filter.decode('utf-8'), None)
+            writer.write(_packet(UNSUBACK, packet_id))
+        elif packet_type == PINGREQ:
+            writer.write(_packet(PINGRESP, b''))
+        elif packet_type == DISCONNECT:
+            return False
+        return True
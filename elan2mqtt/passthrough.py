@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+##########################################################################
+#
+# Statistics of raw payload passthrough
+#
+# In passthrough mode state bodies from eLan and commands from MQTT are
+# forwarded as raw bytes, without JSON decode and encode. To show what
+# it saves, the cost of the skipped round trip is measured on every
+# n-th payload and multiplied by number of payloads.
+#
+##########################################################################
+
+import time
+
+import json_codec
+
+
+class PassthroughStats:
+    """Count payloads forwarded without parsing and estimate CPU time saved"""
+
+    def __init__(self, sample_every=100):
+        self._sample_every = sample_every
+        self._parse_cost = 0.0
+        self._serialize_cost = 0.0
+        self.messages = 0
+        self.parsed = 0
+        self.bytes = 0
+
+    def record(self, payload, parsed=False):
+        """Payload was forwarded as it is (parsed = it was parsed anyway, e.g. for cache)"""
+        if self.messages % self._sample_every == 0:
+            self._sample(payload)
+        self.messages += 1
+        self.bytes += len(payload)
+        if parsed:
+            self.parsed += 1
+
+    def _sample(self, payload):
+        try:
+            started = time.perf_counter()
+            data = json_codec.loads(payload)
+            parsed = time.perf_counter()
+            json_codec.dumpb(data)
+            serialized = time.perf_counter()
+        except ValueError:
+            return
+        # exponential moving average of the costs
+        if self._parse_cost == 0.0:
+            self._parse_cost = parsed - started
+            self._serialize_cost = serialized - parsed
+        else:
+            self._parse_cost = 0.8 * self._parse_cost + 0.2 * (parsed - started)
+            self._serialize_cost = 0.8 * self._serialize_cost + 0.2 * (serialized - parsed)
+
+    def saved(self):
+        """Estimated CPU time in s saved so far"""
+        return (self.messages * self._serialize_cost
+                + (self.messages - self.parsed) * self._parse_cost)
+
+    def stats(self):
+        per_message = self.saved() / self.messages if self.messages else 0.0
+        return {'messages': self.messages, 'bytes': self.bytes,
+                'saved_us_per_message': round(per_message * 1e6, 1),
+                'saved_s': round(self.saved(), 4)}
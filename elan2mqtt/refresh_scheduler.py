@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+##########################################################################
+#
+# Freshness aware refresh of device states
+#
+# For every device the time it was last seen (its state was fetched
+# from eLan or published by someone else) is tracked. Only devices
+# which were not seen for their refresh period are refreshed.
+# Refreshes are spread over the period with random jitter, so eLan gets
+# steady trickle of requests instead of burst of all devices at once.
+#
+# Refresh period depends on device class (eLan device type or product
+# type), e.g. "thermometer:300,RFSA-:60"
+#
+##########################################################################
+
+import asyncio
+import logging
+import random
+
+logger = logging.getLogger(__name__)
+
+
+def parse_periods(text):
+    """Parse "class:period,class:period" into list of (class, period)"""
+    periods = []
+    for item in text.split(','):
+        if item.strip():
+            device_class, period = item.rsplit(':', 1)
+            periods.append((device_class.strip(), float(period)))
+    return periods
+
+
+class RefreshScheduler:
+    """Refresh stale devices one by one.
+
+    refresh is coroutine function refresh(mac) which fetches and publishes state.
+    periods is list of (class, period) - first class found in device type
+    or product type wins, default_period is used for other devices.
+    """
+
+    def __init__(self, refresh, default_period=60, periods=(), jitter=0.2):
+        self._refresh = refresh
+        self._default_period = default_period
+        self._periods = list(periods)
+        self._jitter = jitter
+        self._device_periods = {}
+        self._due = {}
+        self._wakeup = asyncio.Event()
+        self.refreshed = 0
+
+    def _next_due(self, period):
+        loop = asyncio.get_event_loop()
+        return loop.time() + period * random.uniform(1 - self._jitter, 1)
+
+    def add_device(self, mac, info):
+        """Register device. First refresh is randomly spread over its period."""
+        device_info = info['device info']
+        period = self._default_period
+        for device_class, class_period in self._periods:
+            if (device_class in device_info.get('type', '')) or (device_class in device_info.get('product type', '')):
+                period = class_period
+                break
+        self._device_periods[mac] = period
+        if mac not in self._due:
+            self._due[mac] = asyncio.get_event_loop().time() + random.uniform(0, period)
+            self._wakeup.set()
+
+    def remove_device(self, mac):
+        self._device_periods.pop(mac, None)
+        self._due.pop(mac, None)
+
+    def seen(self, mac):
+        """Device state is fresh now - postpone its refresh"""
+        if mac in self._due:
+            self._due[mac] = self._next_due(self._device_periods[mac])
+
+    async def run(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            if not self._due:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            mac = min(self._due, key=self._due.get)
+            delay = self._due[mac] - loop.time()
+            if delay > 0:
+                # wait until the device is due (or new device is added)
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            # refresh is not repeated immediately even when it fails
+            self.seen(mac)
+            self.refreshed += 1
+            try:
+                await self._refresh(mac)
+            except asyncio.TimeoutError:
+                logger.warning("Timeout during refresh of " + mac)
+            except Exception:
+                # one failing device must not stop refreshes of the others
+                logger.exception("Refresh of " + mac + " failed")
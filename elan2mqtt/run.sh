@@ -18,4 +18,4 @@ echo "Starting gateway"
 echo ${ELAN_URL} ${MQTT_SERVER}
 echo "Loglevel:" ${LOGLEVEL} 
 echo "Autodiscovery disabled:" ${DISABLEAUTODISCOVERY}
-python3 main_worker.py ${ELAN_URL} ${MQTT_SERVER} -elan-user ${USERNAME} -elan-password ${PASSWORD} -log-level ${LOGLEVEL} -disable-autodiscovery ${DISABLEAUTODISCOVERY} & python3 socket_listener.py ${ELAN_URL} ${MQTT_SERVER} -elan-user ${USERNAME} -elan-password ${PASSWORD} -log-level ${LOGLEVEL} 
+python3 main_worker.py ${ELAN_URL} ${MQTT_SERVER} -elan-user ${USERNAME} -elan-password ${PASSWORD} -log-level ${LOGLEVEL} -disable-autodiscovery ${DISABLEAUTODISCOVERY} -cache-file /data/main_worker_cache.json -websocket true -passthrough true
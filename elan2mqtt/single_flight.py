@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+##########################################################################
+#
+# Single-flight execution of coroutine per key (device)
+#
+# - calls for the same key share one fetch in flight
+# - calls arriving during the fetch (it might have missed the change
+#   they announce) share at most one follow-up fetch started after it
+#
+##########################################################################
+
+import asyncio
+
+
+class SingleFlight:
+    """Coalesce concurrent calls of coroutine function fetch(key).
+
+    Instance is called like the wrapped function: await single_flight(key)
+    """
+
+    def __init__(self, fetch):
+        self._fetch = fetch
+        self._running = {}
+        self._follow_ups = {}
+        self.calls = 0
+        self.fetches = 0
+
+    @property
+    def saved(self):
+        """Number of calls which did not need their own fetch"""
+        return self.calls - self.fetches
+
+    def stats(self):
+        return {'calls': self.calls, 'fetches': self.fetches, 'saved': self.saved}
+
+    async def __call__(self, key):
+        self.calls += 1
+        task = self._follow_ups.get(key)
+        if task is None:
+            running = self._running.get(key)
+            if running is None:
+                task = asyncio.ensure_future(self._run(key))
+                self._running[key] = task
+            else:
+                task = asyncio.ensure_future(self._run(key, running))
+                self._follow_ups[key] = task
+        # waiter being cancelled must not cancel fetch shared with others
+        return await asyncio.shield(task)
+
+    async def _run(self, key, previous=None):
+        task = asyncio.current_task()
+        if previous is not None:
+            # wait for fetch in flight, then this follow-up becomes the one in flight
+            await asyncio.wait([previous])
+            del self._follow_ups[key]
+            self._running[key] = task
+        self.fetches += 1
+        try:
+            return await self._fetch(key)
+        finally:
+            if self._running.get(key) is task:
+                del self._running[key]
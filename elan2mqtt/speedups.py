@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+
+##########################################################################
+#
+# Report which accelerated (C) paths of vendored aiohttp are active
+#
+# Extensions are built by build_aiohttp.py. When an extension is missing
+# (or AIOHTTP_NO_EXTENSIONS is set) aiohttp silently uses pure python.
+#
+##########################################################################
+
+from aiohttp import helpers, http_parser, http_websocket, http_writer
+
+
+def accelerated():
+    """Return {path: True when C implementation is used}"""
+    return {
+        'http_parser': http_parser.HttpResponseParser is not http_parser.HttpResponseParserPy,
+        'websocket_mask': http_websocket._websocket_mask is not http_websocket._websocket_mask_python,
+        'http_writer': http_writer._serialize_headers is not http_writer._py_serialize_headers,
+        'helpers': helpers.reify is not helpers.reify_py,
+    }
+
+
+def describe():
+    paths = accelerated()
+    active = [path for path, c in paths.items() if c]
+    missing = [path for path, c in paths.items() if not c]
+    if not missing:
+        return "all C extensions active (" + ", ".join(active) + ")"
+    return ("C: " + (", ".join(active) or "none")
+            + "; pure python: " + ", ".join(missing))
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+##########################################################################
+#
+# In-memory cache of last published device states
+#
+# For every MAC the hash of canonical JSON (sorted keys) of the last
+# published state is kept. State which did not change is not published
+# again unless it is older than max_staleness (heartbeat).
+# Raw state (bytes, passthrough mode) is hashed as it is, without parsing.
+#
+##########################################################################
+
+import hashlib
+import time
+
+import json_codec
+
+
+class StateCache:
+    """Detect changes of device state to suppress redundant MQTT publishes.
+
+    max_staleness is time in s after which unchanged state is published anyway
+    (0 = unchanged state is never republished).
+    """
+
+    def __init__(self, max_staleness=0):
+        self._max_staleness = max_staleness
+        self._last = {}
+        self.published = 0
+        self.skipped = 0
+
+    @staticmethod
+    def _digest(state):
+        if isinstance(state, (bytes, bytearray)):
+            return hashlib.sha1(state).digest()
+        return hashlib.sha1(json_codec.canonical(state)).digest()
+
+    def is_changed(self, mac, state):
+        """Return True when state should be published (and remember it as published)"""
+        digest = self._digest(state)
+        now = time.monotonic()
+        last = self._last.get(mac)
+        if (last is not None and last[0] == digest
+                and (self._max_staleness <= 0 or now - last[1] < self._max_staleness)):
+            self.skipped += 1
+            return False
+        self._last[mac] = (digest, now)
+        self.published += 1
+        return True
+
+    def forget(self, mac):
+        """Next state of the device will be published regardless of the change"""
+        self._last.pop(mac, None)
+
+    def stats(self):
+        return {'published': self.published, 'skipped': self.skipped}
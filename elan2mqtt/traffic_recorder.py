@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+##########################################################################
+#
+# Recording of gateway traffic (for replay, see benchmarks/replay.py)
+#
+# eLan websocket frames, HTTP requests to eLan with their responses and
+# MQTT messages received by the gateway are appended to file, one JSON
+# array per line, time is time.monotonic relative to the start:
+#
+#   ["start", 0.0, {"version": 1, "elan_url": ..., "time": <unix time>}]
+#   ["ws", t, frame]
+#   ["http", t, seq, method, url, status, duration, request body or null]
+#   ["body", t, seq, response body]
+#   ["mqtt", t, topic, payload]
+#
+# Body of POST /login (password hash) is not recorded.
+# Response body gets its own record (linked by seq of the request) as it
+# is known only when the gateway reads it - which is after the request
+# ended (response headers arrived) and might never happen.
+# File is flushed (in executor) one second after the first unflushed
+# record, so recording does not add a write per message and at most the
+# last second is lost when the gateway is killed. close() flushes the rest
+# when the gateway exits.
+#
+##########################################################################
+
+import asyncio
+import time
+
+import aiohttp
+
+import json_codec
+
+VERSION = 1
+
+
+def _text(data):
+    if isinstance(data, (bytes, bytearray)):
+        return bytes(data).decode('utf-8', 'replace')
+    return data
+
+
+class TrafficRecorder:
+    """Append traffic of the gateway to file.
+
+    HTTP is recorded by aiohttp.ClientSession(trace_configs=[recorder.trace_config()]),
+    websocket frames and MQTT messages by calling websocket() and mqtt().
+    """
+
+    def __init__(self, path, elan_url='', flush_interval=1.0):
+        self._file = open(path, 'ab')
+        self._started = time.monotonic()
+        self._flush_interval = flush_interval
+        self._flush_pending = False
+        self._seq = 0
+        self.records = 0
+        self._file.write(json_codec.dumpb(['start', 0.0, {'version': VERSION, 'elan_url': elan_url,
+                                                           'time': time.time()}]) + b'\n')
+        self._file.flush()
+
+    def _write(self, record):
+        self._file.write(json_codec.dumpb(record) + b'\n')
+        self.records += 1
+        if not self._flush_pending:
+            self._flush_pending = True
+            asyncio.get_event_loop().call_later(self._flush_interval, self.flush)
+
+    def flush(self):
+        """Write buffered records to file (in executor, the loop is not blocked)"""
+        self._flush_pending = False
+        if not self._file.closed:
+            asyncio.get_event_loop().run_in_executor(None, self._flush)
+
+    def _flush(self):
+        try:
+            self._file.flush()
+        except ValueError:
+            # closed meanwhile - close() flushed it
+            pass
+
+    def _time(self, timestamp=None):
+        return round((timestamp or time.monotonic()) - self._started, 6)
+
+    def websocket(self, frame):
+        self._write(['ws', self._time(), _text(frame)])
+
+    def mqtt(self, topic, payload, timestamp=None):
+        """Record MQTT message (timestamp is time.monotonic when it was received)"""
+        self._write(['mqtt', self._time(timestamp), topic, _text(payload)])
+
+    def close(self):
+        """Flush and close the file (when the gateway exits)"""
+        if not self._file.closed:
+            self._file.flush()
+            self._file.close()
+
+    def trace_config(self):
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self._on_request_start)
+        trace_config.on_request_chunk_sent.append(self._on_request_chunk_sent)
+        trace_config.on_request_end.append(self._on_request_end)
+        trace_config.on_response_chunk_received.append(self._on_response_chunk_received)
+        return trace_config
+
+    async def _on_request_start(self, session, context, params):
+        self._seq += 1
+        context.seq = self._seq
+        context.started = time.monotonic()
+        context.body = None
+
+    async def _on_request_chunk_sent(self, session, context, params):
+        if params.chunk and not params.url.path.endswith('/login'):
+            context.body = (context.body or b'') + params.chunk
+
+    async def _on_request_end(self, session, context, params):
+        body = _text(context.body) if context.body is not None else None
+        self._write(['http', self._time(context.started), context.seq, params.method, str(params.url),
+                     params.response.status, round(time.monotonic() - context.started, 6), body])
+
+    async def _on_response_chunk_received(self, session, context, params):
+        self._write(['body', self._time(), context.seq, _text(params.chunk)])
+
+
+def read_records(path):
+    """Iterate over records of recording (incomplete last line is skipped)"""
+    with open(path, 'rb') as f:
+        for line in f:
+            if line.endswith(b'\n'):
+                yield json_codec.loads(line)
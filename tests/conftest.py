@@ -0,0 +1,7 @@
+import os
+import sys
+
+# gateway modules and the vendored aiohttp
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'elan2mqtt'))
+
+pytest_plugins = ['aiohttp.pytest_plugin', 'elan2mqtt_fixtures']
@@ -0,0 +1,120 @@
+import asyncio
+import collections
+
+from command_dispatcher import CommandDispatcher
+
+TRIGGERS = frozenset(['increase', 'decrease', 'delayed off'])
+
+
+def coalesce(*commands, triggers=TRIGGERS):
+    queue = collections.deque(commands)
+    data, merged = CommandDispatcher._coalesce(queue, triggers)
+    return data, merged, list(queue)
+
+
+def test_newer_value_supersedes_older():
+    assert coalesce({'brightness': 10}, {'brightness': 20}, {'brightness': 30}) == ({'brightness': 30}, 3, [])
+
+
+def test_different_keys_are_merged():
+    assert coalesce({'on': True}, {'delayed off: set time': 60}) == ({'on': True, 'delayed off: set time': 60}, 2, [])
+
+
+def test_repeated_trigger_is_not_merged():
+    assert coalesce({'increase': None}, {'increase': None}) == ({'increase': None}, 1, [{'increase': None}])
+    assert coalesce({'increase': None, 'brightness': 5}, {'brightness': 6}, {'increase': None}) \
+        == ({'increase': None, 'brightness': 6}, 2, [{'increase': None}])
+
+
+def test_different_triggers_are_merged():
+    assert coalesce({'increase': None}, {'delayed off': None}) == ({'increase': None, 'delayed off': None}, 2, [])
+
+
+def test_single_raw_command_stays_unparsed():
+    assert coalesce(b'{"on": true}') == (b'{"on": true}', 1, [])
+
+
+def test_raw_commands_are_parsed_for_merge():
+    assert coalesce(b'{"on": true}', b'{"on": false}') == ({'on': False}, 2, [])
+
+
+def test_command_which_is_not_object_is_not_merged():
+    assert coalesce({'on': True}, b'not json', {'on': False}) == ({'on': True}, 1, [b'not json', {'on': False}])
+    assert coalesce(b'not json', {'on': False}) == (b'not json', 1, [{'on': False}])
+
+
+async def test_commands_of_busy_device_are_merged():
+    sent = []
+    release = asyncio.Event()
+
+    async def handler(mac, data):
+        sent.append((mac, data))
+        await release.wait()
+
+    dispatcher = CommandDispatcher(handler, max_concurrency=4)
+    dispatcher.add_device('1', triggers=['increase'])
+    try:
+        dispatcher.dispatch('1', {'brightness': 10})
+        await asyncio.sleep(0)
+        # first command is sent at once, these wait for it
+        for data in ({'brightness': 20}, {'increase': None}, {'increase': None}, {'brightness': 30}):
+            dispatcher.dispatch('1', data)
+        assert dispatcher.queue_depth() == {'1': 4}
+        release.set()
+        for _ in range(10):
+            await asyncio.sleep(0)
+        assert sent == [('1', {'brightness': 10}), ('1', {'brightness': 20, 'increase': None}),
+                        ('1', {'increase': None, 'brightness': 30})]
+        assert (dispatcher.commands_received, dispatcher.commands_sent) == (5, 3)
+        assert dispatcher.dispatch('unknown', {'on': True}) is False
+    finally:
+        await dispatcher.close()
+
+
+async def test_failing_command_does_not_stop_worker():
+    sent = []
+
+    async def handler(mac, data):
+        sent.append(data)
+        if data == 'fail':
+            raise ValueError(data)
+
+    dispatcher = CommandDispatcher(handler)
+    dispatcher.add_device('1')
+    try:
+        dispatcher.dispatch('1', 'fail')
+        await asyncio.sleep(0.01)
+        dispatcher.dispatch('1', 'ok')
+        await asyncio.sleep(0.01)
+        assert sent == ['fail', 'ok']
+    finally:
+        await dispatcher.close()
+
+
+async def test_removed_device_worker_is_stopped():
+    started = asyncio.Event()
+    cancelled = []
+
+    async def handler(mac, data):
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(mac)
+            raise
+
+    dispatcher = CommandDispatcher(handler)
+    dispatcher.add_device('1')
+    dispatcher.add_device('2')
+    try:
+        dispatcher.dispatch('1', {'on': True})
+        dispatcher.dispatch('1', {'on': False})
+        await started.wait()
+        await dispatcher.remove_device('1')
+        assert cancelled == ['1']
+        assert dispatcher.queue_depth() == {'2': 0}
+        assert dispatcher.dispatch('1', {'on': True}) is False
+        # removing unknown device does nothing
+        await dispatcher.remove_device('1')
+    finally:
+        await dispatcher.close()
@@ -0,0 +1,58 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+from elan_auth import ElanAuthenticator
+
+
+def client_session():
+    return aiohttp.ClientSession(cookie_jar=aiohttp.CookieJar(unsafe=True))
+
+
+async def test_login_and_relogin_after_expiry(elan_simulator):
+    simulator = await elan_simulator(devices=1)
+    async with client_session() as session:
+        auth = ElanAuthenticator(session, simulator.url, 'admin', b'elan')
+        await auth.login()
+        assert (auth.generation, auth.logins) == (1, 1)
+        # logged in already - probe finds it out, no POST /login
+        await auth.login()
+        assert (auth.generation, simulator.requests['login']) == (2, 1)
+
+        simulator.expire_sessions()
+        generation = auth.generation
+        async with session.get(simulator.url + '/api/devices/10000/state') as resp:
+            assert auth.is_expired(resp)
+        await auth.relogin(generation)
+        async with session.get(simulator.url + '/api/devices/10000/state') as resp:
+            assert resp.status == 200
+        # somebody logged in since the failed request - no new login
+        await auth.relogin(generation)
+        assert simulator.requests['login'] == 2
+
+
+async def test_concurrent_relogins_share_one_login(elan_simulator):
+    simulator = await elan_simulator(devices=1)
+    async with client_session() as session:
+        auth = ElanAuthenticator(session, simulator.url, 'admin', b'elan')
+        await asyncio.gather(*[auth.relogin(auth.generation) for _ in range(5)])
+        assert simulator.requests['login'] == 1
+        assert auth.logins == 1
+
+
+async def test_rejected_login_fails_after_attempts(elan_simulator):
+    simulator = await elan_simulator(devices=1)
+    async with client_session() as session:
+        auth = ElanAuthenticator(session, simulator.url, 'admin', b'wrong', attempts=2)
+        with pytest.raises(Exception, match='Login to eLan failed'):
+            await auth.relogin(auth.generation)
+        assert (auth.failures, simulator.requests['login']) == (2, 2)
+
+
+async def test_network_error_is_failed_attempt(aiohttp_unused_port):
+    async with client_session() as session:
+        auth = ElanAuthenticator(session, 'http://127.0.0.1:%d' % aiohttp_unused_port(), 'admin', b'elan', attempts=2)
+        with pytest.raises(Exception, match='Login to eLan failed'):
+            await auth.relogin(auth.generation)
+        assert auth.failures == 2
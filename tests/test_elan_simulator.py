@@ -0,0 +1,62 @@
+import hashlib
+
+import aiohttp
+
+import json_codec
+
+CREDENTIALS = {'name': 'admin', 'key': hashlib.sha1(b'elan').hexdigest()}
+
+
+def client_session():
+    # AuthID cookie is set by IP address host
+    return aiohttp.ClientSession(cookie_jar=aiohttp.CookieJar(unsafe=True))
+
+
+async def test_login(elan_simulator):
+    simulator = await elan_simulator(devices=2)
+    async with client_session() as session:
+        async with session.get(simulator.url + '/api') as resp:
+            assert resp.status == 401
+        async with session.post(simulator.url + '/login', data=dict(CREDENTIALS, key='wrong')) as resp:
+            assert resp.status == 401
+        async with session.post(simulator.url + '/login', data=CREDENTIALS) as resp:
+            assert resp.status == 200
+        async with session.get(simulator.url + '/api/devices') as resp:
+            assert resp.status == 200
+            assert sorted(await resp.json()) == ['10000', '10001']
+
+
+async def test_expired_session_gets_401(elan_simulator):
+    simulator = await elan_simulator(devices=1)
+    async with client_session() as session:
+        async with session.post(simulator.url + '/login', data=CREDENTIALS) as resp:
+            assert resp.status == 200
+        simulator.expire_sessions()
+        async with session.get(simulator.url + '/api/devices/10000/state') as resp:
+            assert resp.status == 401
+        async with session.post(simulator.url + '/login', data=CREDENTIALS) as resp:
+            assert resp.status == 200
+        async with session.get(simulator.url + '/api/devices/10000/state') as resp:
+            assert resp.status == 200
+
+
+async def test_put_is_announced_over_websocket(elan_simulator):
+    simulator = await elan_simulator(devices=1, products=['RFSA-66M'])
+    async with client_session() as session:
+        async with session.post(simulator.url + '/login', data=CREDENTIALS) as resp:
+            assert resp.status == 200
+        async with session.ws_connect(simulator.url + '/api/ws') as websocket:
+            async with session.put(simulator.url + '/api/devices/10000', json={'on': True}) as resp:
+                assert resp.status == 200
+            message = await websocket.receive(timeout=3)
+            assert json_codec.loads(message.data) == {'device': '10000'}
+        async with session.get(simulator.url + '/api/devices/10000/state') as resp:
+            assert (await resp.json())['on'] is True
+
+
+async def test_unknown_action_is_rejected(elan_simulator):
+    simulator = await elan_simulator(devices=1, products=['RFSA-66M'])
+    async with client_session() as session:
+        await session.post(simulator.url + '/login', data=CREDENTIALS)
+        async with session.put(simulator.url + '/api/devices/10000', json={'brightness': 5}) as resp:
+            assert resp.status == 400
@@ -0,0 +1,38 @@
+from latency import EVENT_STAGES, Pipeline
+from metrics import MetricsRegistry
+
+
+def histograms(registry):
+    """stage -> (count, sum) of event pipeline stage histograms"""
+    return {stage: (histogram.count, round(histogram.sum, 6)) for stage, histogram
+            in ((stage, registry.histogram('pipeline_stage_seconds', '', pipeline='event', stage=stage))
+                for stage in EVENT_STAGES[1:])}
+
+
+def test_message_passes_stages(loop):
+    registry = MetricsRegistry()
+    events = Pipeline(registry, 'event', EVENT_STAGES)
+    assert events.start('mac', 10.0)
+    events.stage('mac', 'parsed', 10.1)
+    events.stage('mac', 'state', 10.4)
+    events.stage('mac', 'published', 10.5)
+    assert histograms(registry) == {'parsed': (1, 0.1), 'state': (1, 0.3), 'published': (1, 0.1)}
+
+
+def test_second_message_does_not_stamp_message_in_flight(loop):
+    registry = MetricsRegistry()
+    events = Pipeline(registry, 'event', EVENT_STAGES)
+    assert events.start('mac', 10.0)
+    events.stage('mac', 'parsed', 10.0)
+    # second event of the device while the first one waits for its GET
+    assert not events.start('mac', 10.5)
+    events.stage('mac', 'state', 10.6)
+    assert histograms(registry)['parsed'] == (1, 0.0)
+    assert histograms(registry)['state'] == (1, 0.6)
+
+
+def test_aborted_message_frees_slot(loop):
+    events = Pipeline(MetricsRegistry(), 'event', EVENT_STAGES)
+    assert events.start('mac', 10.0)
+    events.abort('mac')
+    assert events.start('mac', 11.0)
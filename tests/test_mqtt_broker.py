@@ -0,0 +1,113 @@
+import asyncio
+
+import paho.mqtt.client as mqtt
+import pytest
+
+from mqtt_broker import topic_matches
+
+
+@pytest.mark.parametrize('topic_filter, topic', [
+    ('a/b/c', 'a/b/c'),
+    ('a/+/c', 'a/b/c'),
+    ('a/+', 'a/'),
+    ('a/#', 'a/b/c'),
+    ('a/#', 'a'),
+    ('#', 'a/b'),
+    ('+/+', '/b'),
+])
+def test_topic_matches(topic_filter, topic):
+    assert topic_matches(topic_filter, topic)
+
+
+@pytest.mark.parametrize('topic_filter, topic', [
+    ('a/b', 'a'),
+    ('a/b', 'a/b/c'),
+    ('a/+', 'a/b/c'),
+    ('a/+/c', 'a/b/d'),
+    ('#', '$SYS/broker'),
+    ('+/broker', '$SYS/broker'),
+])
+def test_topic_does_not_match(topic_filter, topic):
+    assert not topic_matches(topic_filter, topic)
+
+
+class Subscriber:
+    """paho client collecting (topic, payload, qos, retain) of received messages"""
+
+    def __init__(self, port, client_id='subscriber'):
+        self.messages = []
+        self.client = mqtt.Client(client_id)
+        self.client.on_message = lambda client, userdata, message: self.messages.append(
+            (message.topic, message.payload, message.qos, message.retain))
+        self.client.connect('127.0.0.1', port)
+        self.client.loop_start()
+
+    async def subscribe(self, topic_filter, qos):
+        result, mid = self.client.subscribe(topic_filter, qos)
+        assert result == mqtt.MQTT_ERR_SUCCESS
+        # SUBACK - broker routes messages to the subscription from now on
+        await asyncio.sleep(0.2)
+
+    async def wait_for(self, count, timeout=3):
+        deadline = asyncio.get_event_loop().time() + timeout
+        while len(self.messages) < count and asyncio.get_event_loop().time() < deadline:
+            await asyncio.sleep(0.02)
+        return self.messages
+
+    def close(self):
+        self.client.disconnect()
+        self.client.loop_stop()
+
+
+async def test_retained_message_set_and_cleared(mqtt_broker):
+    broker = await mqtt_broker()
+    broker.publish('homeassistant/switch/1/config', '{"name": "x"}', qos=1, retain=True)
+    assert broker.retained == {'homeassistant/switch/1/config': (b'{"name": "x"}', 1)}
+
+    subscriber = Subscriber(broker.port)
+    try:
+        await subscriber.subscribe('homeassistant/#', 1)
+        messages = await subscriber.wait_for(1)
+        assert messages == [('homeassistant/switch/1/config', b'{"name": "x"}', 1, 1)]
+
+        # empty retained message removes it
+        broker.publish('homeassistant/switch/1/config', b'', retain=True)
+        assert broker.retained == {}
+        late = Subscriber(broker.port, 'late-subscriber')
+        try:
+            await late.subscribe('homeassistant/#', 1)
+            await asyncio.sleep(0.2)
+            assert late.messages == []
+        finally:
+            late.close()
+    finally:
+        subscriber.close()
+
+
+async def test_qos_downgraded_to_subscription(mqtt_broker):
+    broker = await mqtt_broker()
+    subscriber = Subscriber(broker.port)
+    try:
+        await subscriber.subscribe('eLan/+/status', 0)
+        broker.publish('eLan/1/status', '{"on": true}', qos=1)
+        messages = await subscriber.wait_for(1)
+        assert messages == [('eLan/1/status', b'{"on": true}', 0, 0)]
+    finally:
+        subscriber.close()
+
+
+async def test_published_by_client_is_counted_and_routed(mqtt_broker):
+    published = []
+    broker = await mqtt_broker(on_publish=lambda topic, payload: published.append((topic, payload)))
+    subscriber = Subscriber(broker.port)
+    try:
+        await subscriber.subscribe('eLan/+/command', 1)
+        subscriber.client.publish('eLan/1/command', '{"on": false}', qos=1)
+        await broker.wait_for('eLan/#', count=1, timeout=3)
+        messages = await subscriber.wait_for(1)
+        assert published == [('eLan/1/command', b'{"on": false}')]
+        assert messages == [('eLan/1/command', b'{"on": false}', 1, 0)]
+        assert broker.count('eLan/+/command') == 1
+        assert broker.count('eLan/+/status') == 0
+    finally:
+        subscriber.close()
@@ -0,0 +1,73 @@
+import asyncio
+
+from refresh_scheduler import RefreshScheduler, parse_periods
+
+INFO = {'device info': {'type': 'light', 'product type': 'RFSA-66M'}}
+THERMOMETER = {'device info': {'type': 'thermometer', 'product type': 'RFTI-10B'}}
+
+
+def test_parse_periods():
+    assert parse_periods('thermometer:300, RFSA-:60,') == [('thermometer', 300.0), ('RFSA-', 60.0)]
+    assert parse_periods('') == []
+
+
+async def run(scheduler, duration):
+    task = asyncio.ensure_future(scheduler.run())
+    await asyncio.sleep(duration)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+async def test_failing_device_does_not_stop_refreshes():
+    refreshed = []
+
+    async def refresh(mac):
+        refreshed.append(mac)
+        if mac == 'failing':
+            raise AssertionError('Status retreival from eLan failed!')
+        if mac == 'slow':
+            raise asyncio.TimeoutError()
+
+    scheduler = RefreshScheduler(refresh, default_period=0.05)
+    for mac in ('failing', 'slow', 'ok'):
+        scheduler.add_device(mac, INFO)
+    await run(scheduler, 0.3)
+    assert refreshed.count('ok') >= 3
+    assert refreshed.count('failing') >= 3
+    assert refreshed.count('slow') >= 3
+
+
+async def test_seen_device_is_not_refreshed():
+    refreshed = []
+
+    async def refresh(mac):
+        refreshed.append(mac)
+
+    scheduler = RefreshScheduler(refresh, default_period=0.1)
+    scheduler.add_device('seen', INFO)
+    scheduler.add_device('removed', INFO)
+    scheduler.remove_device('removed')
+    task = asyncio.ensure_future(scheduler.run())
+    try:
+        for _ in range(10):
+            scheduler.seen('seen')
+            await asyncio.sleep(0.05)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+    assert refreshed == []
+
+
+async def test_period_by_device_class():
+    refreshed = []
+
+    async def refresh(mac):
+        refreshed.append(mac)
+
+    scheduler = RefreshScheduler(refresh, default_period=0.05, periods=[('thermometer', 60)])
+    scheduler.add_device('light', INFO)
+    scheduler.add_device('thermometer', THERMOMETER)
+    await run(scheduler, 0.3)
+    assert 'light' in refreshed
+    # first refresh is spread over 60 s - almost never within 0.3 s
+    assert refreshed.count('thermometer') <= 1
@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+class Fetch:
+    """Fetch of which every call waits until released, returns its number"""
+
+    def __init__(self):
+        self.started = []
+        self._gates = []
+
+    async def __call__(self, key):
+        gate = asyncio.get_event_loop().create_future()
+        self.started.append(key)
+        self._gates.append(gate)
+        return await gate
+
+    def release(self, result=None, exception=None):
+        gate = self._gates.pop(0)
+        if exception is not None:
+            gate.set_exception(exception)
+        else:
+            gate.set_result(result)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def test_callers_during_fetch_share_one_follow_up():
+    fetch = Fetch()
+    single_flight = SingleFlight(fetch)
+    first = asyncio.ensure_future(single_flight('mac'))
+    await settle()
+    # these might have missed the change - one follow-up fetch for all of them
+    waiting = [asyncio.ensure_future(single_flight('mac')) for _ in range(3)]
+    await settle()
+    assert fetch.started == ['mac']
+    fetch.release('first')
+    assert await first == 'first'
+    await settle()
+    assert fetch.started == ['mac', 'mac']
+    # caller arriving when the follow-up is in flight gets a new follow-up
+    late = asyncio.ensure_future(single_flight('mac'))
+    await settle()
+    fetch.release('follow-up')
+    assert await asyncio.gather(*waiting) == ['follow-up'] * 3
+    await settle()
+    fetch.release('late')
+    assert await late == 'late'
+    assert single_flight.stats() == {'calls': 5, 'fetches': 3, 'saved': 2}
+
+
+async def test_later_callers_join_pending_follow_up():
+    fetch = Fetch()
+    single_flight = SingleFlight(fetch)
+    first = asyncio.ensure_future(single_flight('mac'))
+    await settle()
+    follow_up = asyncio.ensure_future(single_flight('mac'))
+    await settle()
+    joined = asyncio.ensure_future(single_flight('mac'))
+    await settle()
+    fetch.release(1)
+    await settle()
+    fetch.release(2)
+    assert await asyncio.gather(first, follow_up, joined) == [1, 2, 2]
+    assert single_flight.fetches == 2
+
+
+async def test_keys_are_independent():
+    fetch = Fetch()
+    single_flight = SingleFlight(fetch)
+    calls = [asyncio.ensure_future(single_flight(key)) for key in ('a', 'b')]
+    await settle()
+    assert fetch.started == ['a', 'b']
+    fetch.release('a')
+    fetch.release('b')
+    assert await asyncio.gather(*calls) == ['a', 'b']
+
+
+async def test_exception_reaches_every_waiter():
+    fetch = Fetch()
+    single_flight = SingleFlight(fetch)
+    first = asyncio.ensure_future(single_flight('mac'))
+    await settle()
+    waiting = [asyncio.ensure_future(single_flight('mac')) for _ in range(2)]
+    await settle()
+    fetch.release(exception=asyncio.TimeoutError())
+    with pytest.raises(asyncio.TimeoutError):
+        await first
+    await settle()
+    fetch.release(exception=ValueError('broken state'))
+    for waiter in waiting:
+        with pytest.raises(ValueError):
+            await waiter
+    # failed fetch does not block next calls
+    next_call = asyncio.ensure_future(single_flight('mac'))
+    await settle()
+    fetch.release('ok')
+    assert await next_call == 'ok'
+
+
+async def test_cancelled_waiter_does_not_cancel_shared_fetch():
+    fetch = Fetch()
+    single_flight = SingleFlight(fetch)
+    cancelled = asyncio.ensure_future(single_flight('mac'))
+    await settle()
+    follow_up = asyncio.ensure_future(single_flight('mac'))
+    other = asyncio.ensure_future(single_flight('mac'))
+    await settle()
+    cancelled.cancel()
+    follow_up.cancel()
+    await settle()
+    assert cancelled.cancelled() and follow_up.cancelled()
+    fetch.release('first')
+    await settle()
+    # the follow-up still runs for the waiter which was not cancelled
+    assert fetch.started == ['mac', 'mac']
+    fetch.release('follow-up')
+    assert await other == 'follow-up'
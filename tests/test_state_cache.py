@@ -0,0 +1,36 @@
+from state_cache import StateCache
+
+
+def test_unchanged_state_is_not_published():
+    cache = StateCache()
+    assert cache.is_changed('mac', {'on': True, 'locked': False})
+    # key order does not matter
+    assert not cache.is_changed('mac', {'locked': False, 'on': True})
+    assert cache.is_changed('mac', {'on': False, 'locked': False})
+    assert cache.is_changed('other', {'on': False, 'locked': False})
+    assert cache.stats() == {'published': 3, 'skipped': 1}
+
+
+def test_raw_state_is_compared_as_it_is():
+    cache = StateCache()
+    assert cache.is_changed('mac', b'{"on":true}')
+    assert not cache.is_changed('mac', b'{"on":true}')
+    assert cache.is_changed('mac', b'{"on":false}')
+
+
+def test_forgotten_state_is_published_again():
+    cache = StateCache()
+    assert cache.is_changed('mac', {'on': True})
+    cache.forget('mac')
+    assert cache.is_changed('mac', {'on': True})
+
+
+def test_stale_state_is_published_again(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('state_cache.time.monotonic', lambda: now[0])
+    cache = StateCache(max_staleness=60)
+    assert cache.is_changed('mac', {'on': True})
+    now[0] += 30
+    assert not cache.is_changed('mac', {'on': True})
+    now[0] += 31
+    assert cache.is_changed('mac', {'on': True})